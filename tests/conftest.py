@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -28,6 +30,9 @@ from django.utils.version import get_version
 assert get_version() < '3.0.0', 'Пожалуйста, используйте версию Django < 3.0.0'
 
 from yatube.settings import INSTALLED_APPS
+from django.test import override_settings
+
+from core.tests.utils import TEST_CACHES
 
 assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts']), (
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
@@ -37,3 +42,31 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+test_cache = override_settings(CACHES=TEST_CACHES)
+
+
+def pytest_configure(config):
+    """
+    Кэш хранится в памяти и не смешивается с кэшем запущенного сайта.
+    Подменяется до сбора тестов: сбор обращается к импортированным в
+    модулях тестов объектам, в том числе к кэшу.
+    """
+    test_cache.enable()
+
+
+def pytest_unconfigure(config):
+    test_cache.disable()
+
+
+@pytest.fixture(autouse=True)
+def project_settings(settings, tmp_path):
+    """
+    Загруженные файлы сохраняются во временный каталог, миниатюры
+    создаются синхронно, без фоновых потоков. Кэш страниц выключен:
+    страница из кэша отдается без контекста шаблона.
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.THUMBNAIL_WORKERS = 0
+    settings.PAGE_CACHE_ENABLED = False
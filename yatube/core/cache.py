@@ -0,0 +1,381 @@
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.utils.module_loading import import_string
+
+# Служебные ключи: номер последней записи журнала инвалидаций и записи
+# журнала (в хранилище журнала), блокировки пересчета значений (в L2)
+SEQUENCE_KEY = 'tiered:sequence'
+JOURNAL_KEY = 'tiered:journal:{}'
+LOCK_KEY = 'tiered:lock:{}'
+# Файл блокировки в каталоге файлового журнала: под ней процессы берут
+# номер записи журнала, блокировку пересчета значения и выполняют add.
+# incr и add файлового кэша - чтение и запись, не атомарные между
+# процессами
+LOCK_NAME = '.lock'
+# Журнал - кольцо из JOURNAL_SIZE записей: запись с номером n хранится
+# под ключом n % JOURNAL_SIZE, поэтому хранилище журнала не растет и не
+# вытесняет номер последней записи. За одну синхронизацию читается не
+# больше JOURNAL_BATCH записей; при большем отставании кэш процесса
+# очищается целиком
+JOURNAL_SIZE = 1000
+JOURNAL_BATCH = 500
+# Число блокировок, по которым распределяются ключи при пересчете
+KEY_LOCKS = 64
+# Интервал опроса общего кэша в ожидании чужого пересчета, секунды
+WAIT_INTERVAL = 0.05
+
+DEFAULT_L2 = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+# Хранилище журнала по умолчанию - тот же бэкенд, что у L2, в отдельном
+# месте (LOCATION L2 + '/journal'): вытеснение значений из L2 не задевает
+# журнал. Без срока хранения по умолчанию: номер последней записи и
+# записи журнала не истекают
+DEFAULT_JOURNAL_OPTIONS = {
+    'TIMEOUT': None,
+    'OPTIONS': {'MAX_ENTRIES': JOURNAL_SIZE * 2},
+}
+
+# Кэши процессов (L1) по имени кэша: общие для всех потоков процесса
+_tiers = {}
+_tiers_lock = threading.Lock()
+# Блокировка журнала между потоками процесса
+_journal_lock = threading.Lock()
+
+
+class LocalTier:
+    """
+    Кэш процесса: LRU из не более max_entries записей. Значения хранятся
+    сериализованными, как в LocMemCache, чтобы изменение полученного
+    объекта не портило кэш.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = [threading.Lock() for _ in range(KEY_LOCKS)]
+        # Отличает записи журнала, сделанные этим процессом
+        self.token = uuid.uuid4().hex
+        self.sequence = None
+        self.synced_at = None
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires is not None and expires <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, entry, expires):
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (data, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def key_lock(self, key):
+        return self.key_locks[hash(key) % KEY_LOCKS]
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кэш: небольшой LRU в памяти процесса (L1) поверх кэша,
+    общего для всех процессов (L2, по умолчанию файловый, задается
+    OPTIONS['L2']). Запись и удаление ключа попадают в журнал инвалидаций
+    в отдельном общем хранилище (OPTIONS['JOURNAL']), остальные процессы
+    читают его не чаще раза в SYNC_INTERVAL секунд и выбрасывают
+    измененные ключи из L1. Номера записей журнала выдаются под
+    блокировкой, общей для процессов (см. _shared_lock). Значения живут в
+    L1 не дольше L1_TIMEOUT секунд на случай записи в L2 в обход кэша.
+
+    get_or_set защищен от лавины пересчетов: значение начинает
+    пересчитываться заранее с вероятностью, растущей к его истечению и
+    пропорциональной времени прошлого пересчета (XFetch), а одновременные
+    промахи ждут значения, которое вычисляет один поток одного процесса.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        l2 = {**DEFAULT_L2, 'LOCATION': location, **options.get('L2', {})}
+        journal = {
+            'BACKEND': l2['BACKEND'],
+            'LOCATION': os.path.join(l2['LOCATION'], 'journal'),
+            **DEFAULT_JOURNAL_OPTIONS,
+            **options.get('JOURNAL', {}),
+        }
+        self.l2 = import_string(l2.pop('BACKEND'))(l2.pop('LOCATION'), l2)
+        journal_location = journal.pop('LOCATION')
+        self.journal = import_string(journal.pop('BACKEND'))(
+            journal_location, journal
+        )
+        # Журнал в памяти процесса достаточно защитить блокировкой потоков
+        self.lock_path = (
+            os.path.join(journal_location, LOCK_NAME)
+            if isinstance(self.journal, FileBasedCache) else None
+        )
+        self.l1_timeout = options.get('L1_TIMEOUT', 60)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.early_refresh_beta = options.get('EARLY_REFRESH_BETA', 1.0)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(
+                options.get('L1_NAME', location),
+                LocalTier(options.get('L1_MAX_ENTRIES', 500))
+            )
+
+    @contextmanager
+    def _shared_lock(self):
+        """Блокировка журнала, общая для потоков и процессов."""
+        with _journal_lock:
+            if self.lock_path is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                locks.lock(lock_file, locks.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    locks.unlock(lock_file)
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, измененные другими процессами."""
+        tier = self._tier
+        now = time.monotonic()
+        if (
+            tier.synced_at is not None
+            and now - tier.synced_at < self.sync_interval
+        ):
+            return
+        tier.synced_at = now
+        sequence = self.journal.get(SEQUENCE_KEY, 0)
+        if tier.sequence is None or sequence == tier.sequence:
+            tier.sequence = sequence
+            return
+        numbers = range(tier.sequence + 1, sequence + 1)
+        journal = []
+        if 0 < len(numbers) <= JOURNAL_BATCH:
+            journal = [
+                entry for entry in self.journal.get_many([
+                    JOURNAL_KEY.format(number % JOURNAL_SIZE)
+                    for number in numbers
+                ]).values()
+                if entry[0] in numbers
+            ]
+        if len(journal) < len(numbers) or not numbers:
+            # Журнал отстал, перезаписан по кругу или очищен
+            tier.clear()
+        else:
+            for _, token, key in journal:
+                if token != tier.token:
+                    tier.delete(key)
+        tier.sequence = sequence
+
+    def _publish(self, key):
+        """Записывает изменение ключа в журнал инвалидаций."""
+        with self._shared_lock():
+            sequence = self.journal.get(SEQUENCE_KEY, 0) + 1
+            # Запись журнала появляется раньше номера: прочитавший номер
+            # процесс найдет запись
+            self.journal.set(
+                JOURNAL_KEY.format(sequence % JOURNAL_SIZE),
+                (sequence, self._tier.token, key),
+                None
+            )
+            self.journal.set(SEQUENCE_KEY, sequence, None)
+
+    def _l1_expires(self, entry):
+        expires = time.time() + self.l1_timeout
+        if entry[1] is not None:
+            expires = min(expires, entry[1])
+        return expires
+
+    def _get_entry(self, key):
+        """Запись (значение, срок истечения, время пересчета) или None."""
+        self._sync()
+        entry = self._tier.get(key)
+        if entry is None:
+            entry = self.l2.get(key)
+            if entry is not None:
+                self._tier.set(key, entry, self._l1_expires(entry))
+        return entry
+
+    def _store(self, key, value, timeout, delta=0.0):
+        expires = None if timeout is None else time.time() + timeout
+        entry = (value, expires, delta)
+        self.l2.set(key, entry, timeout)
+        if timeout is not None and timeout <= 0:
+            self._tier.delete(key)
+        else:
+            self._tier.set(key, entry, self._l1_expires(entry))
+        self._publish(key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        timeout = self.get_backend_timeout(timeout)
+        expires = None if timeout is None else time.time() + timeout
+        entry = (value, expires, 0.0)
+        with self._shared_lock():
+            if not self.l2.add(key, entry, timeout):
+                return False
+        self._tier.set(key, entry, self._l1_expires(entry))
+        self._publish(key)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        made_keys = {self.make_key(key, version=version): key for key in keys}
+        result = {}
+        missing = []
+        for made_key, key in made_keys.items():
+            self.validate_key(made_key)
+            entry = self._tier.get(made_key)
+            if entry is None:
+                missing.append(made_key)
+            else:
+                result[key] = entry[0]
+        for made_key, entry in self.l2.get_many(missing).items():
+            self._tier.set(made_key, entry, self._l1_expires(entry))
+            result[made_keys[made_key]] = entry[0]
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(key, value, self.get_backend_timeout(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self.l2.get(key)
+        if entry is None:
+            return False
+        self._store(key, entry[0], self.get_backend_timeout(timeout), entry[2])
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.l2.delete(key)
+        self._tier.delete(key)
+        self._publish(key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def clear(self):
+        self.l2.clear()
+        self.journal.clear()
+        self._tier.clear()
+        self._tier.sequence = 0
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+        self.journal.close(**kwargs)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        if not callable(default):
+            return super().get_or_set(key, default, timeout, version)
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        entry = self._get_entry(made_key)
+        if entry is not None and not self._should_refresh(entry):
+            return entry[0]
+        return self._recompute(made_key, entry, default, timeout)
+
+    def _should_refresh(self, entry):
+        """Решает, пересчитать ли значение до истечения (XFetch)."""
+        _, expires, delta = entry
+        if expires is None or not delta:
+            return False
+        # 1 - random() не бывает нулем
+        jitter = -math.log(1 - random.random())
+        early = delta * self.early_refresh_beta * jitter
+        return time.time() + early >= expires
+
+    def _recompute(self, key, stale, default, timeout):
+        """
+        Пересчитывает значение одним потоком на процесс и одним процессом
+        на общий кэш. Пока значение пересчитывается, остальные получают
+        прежнее значение, а при его отсутствии ждут нового.
+        """
+        key_lock = self._tier.key_lock(key)
+        if not key_lock.acquire(blocking=stale is None):
+            return stale[0]
+        try:
+            entry = self._get_entry(key)
+            if entry is not None and (
+                stale is None or entry[1:] != stale[1:]
+            ):
+                # Значение уже пересчитано, пока поток ждал блокировку
+                return entry[0]
+            lock_key = LOCK_KEY.format(key)
+            with self._shared_lock():
+                locked = self.l2.add(lock_key, True, self.lock_timeout)
+            if not locked:
+                if stale is not None:
+                    return stale[0]
+                entry = self._wait(key)
+                if entry is not None:
+                    return entry[0]
+            try:
+                started = time.monotonic()
+                value = default()
+                if value is not None:
+                    self._store(
+                        key,
+                        value,
+                        self.get_backend_timeout(timeout),
+                        time.monotonic() - started
+                    )
+            finally:
+                if locked:
+                    self.l2.delete(lock_key)
+            return value
+        finally:
+            key_lock.release()
+
+    def _wait(self, key):
+        """Ждет значение, пересчитываемое другим процессом."""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = self.l2.get(key)
+            if entry is not None:
+                self._tier.set(key, entry, self._l1_expires(entry))
+                return entry
+        return None
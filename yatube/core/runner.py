@@ -0,0 +1,20 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from core.tests.utils import TEST_CACHES
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Запускает тесты с кэшем в памяти (TEST_CACHES) вместо файлового кэша
+    запущенного сайта, в том числе при создании тестовой БД.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(CACHES=TEST_CACHES)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.cache import (
+    JOURNAL_KEY,
+    LOCK_KEY,
+    SEQUENCE_KEY,
+    LocalTier,
+    TieredCache,
+)
+
+# Число записей в кэш из каждого процесса
+WRITES = 100
+
+
+def make_cache(name='tiered-test', **options):
+    """Кэш с общим уровнем в памяти; name отделяет кэш процесса."""
+    return TieredCache('tiered-test', {'OPTIONS': {
+        'L2': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'L1_NAME': name,
+        'SYNC_INTERVAL': 0,
+        **options,
+    }})
+
+
+def write_keys(location, name, start, count):
+    """Пишет count ключей в файловый кэш из отдельного процесса."""
+    cache = TieredCache(location, {'OPTIONS': {'L1_NAME': name}})
+    start.wait()
+    for number in range(count):
+        cache.set(f'{name}:{number}', number)
+
+
+def compute_value(location, name, start, marker):
+    """Получает значение через get_or_set, отмечая каждый пересчет."""
+    cache = TieredCache(location, {'OPTIONS': {'L1_NAME': name}})
+
+    def compute():
+        with open(marker, 'a') as marker_file:
+            marker_file.write(name + '\n')
+        time.sleep(0.5)
+        return 'value'
+
+    start.wait()
+    cache.get_or_set('hot', compute, 60)
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = make_cache()
+        self.cache.clear()
+        # Второй процесс: свой кэш L1 над тем же L2
+        self.other = make_cache('tiered-test-other')
+        self.other._tier.clear()
+
+    def test_l1_hit_skips_l2(self):
+        """Тест чтения значения из кэша процесса без обращения к L2."""
+        self.cache.set('key', {'value': 1})
+        with mock.patch.object(self.cache.l2, 'get') as l2_get:
+            value = self.cache.get('key')
+        self.assertEqual(value, {'value': 1})
+        l2_get.assert_not_called()
+        value['value'] = 2
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+
+    def test_invalidation_between_processes(self):
+        """Тест сброса значения в L1 другого процесса после записи."""
+        self.cache.set('key', 1)
+        self.assertEqual(self.other.get('key'), 1)
+        self.cache.set('key', 2)
+        self.assertEqual(self.other.get('key'), 2)
+        self.cache.delete('key')
+        self.assertIsNone(self.other.get('key'))
+        self.other.set_many({'first': 1, 'second': 2})
+        self.assertEqual(
+            self.cache.get_many(['first', 'second', 'third']),
+            {'first': 1, 'second': 2}
+        )
+
+    def test_journal_outside_l2(self):
+        """
+        Тест журнала инвалидаций в отдельном хранилище: вытеснение
+        значений из L2 его не задевает, номер последней записи не истекает.
+        """
+        self.cache.set('key', 1)
+        self.cache.l2.clear()
+        later = time.time() + 24 * 60 * 60
+        with mock.patch(
+            'django.core.cache.backends.locmem.time.time', return_value=later
+        ):
+            self.assertEqual(self.cache.journal.get(SEQUENCE_KEY), 1)
+        self.assertIsNone(self.cache.l2.get(SEQUENCE_KEY))
+
+    def test_l1_bounded(self):
+        """Тест вытеснения старых значений из кэша процесса."""
+        tier = LocalTier(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            tier.set(key, key, None)
+        self.assertIsNone(tier.get('a'))
+        self.assertEqual(tier.get('c'), 'c')
+
+    def test_get_or_set_coalesces_misses(self):
+        """Тест одного пересчета при одновременных промахах."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    self.cache.get_or_set('hot', compute, 60)
+                )
+            ) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    @mock.patch('core.cache.random.random', return_value=0.5)
+    def test_get_or_set_refreshes_early(self, _):
+        """
+        Тест пересчета значения до истечения, если пересчет был долгим, и
+        отдачи прежнего значения, пока его пересчитывает другой процесс.
+        """
+        self.cache._store(self.cache.make_key('hot'), 'old', 5, delta=10.0)
+        self.assertEqual(
+            self.cache.get_or_set('hot', lambda: 'new', 60), 'new'
+        )
+        self.cache._store(self.cache.make_key('hot'), 'old', 5, delta=10.0)
+        self.cache.l2.add(LOCK_KEY.format(self.cache.make_key('hot')), True)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(self.cache.get_or_set('hot', compute, 60), 'old')
+        compute.assert_not_called()
+        self.cache.set('cold', 'value', 60)
+        self.assertEqual(
+            self.cache.get_or_set('cold', compute, 60), 'value'
+        )
+        compute.assert_not_called()
+
+
+class TieredCacheProcessesTest(SimpleTestCase):
+    """Тесты файлового кэша, в который одновременно пишут два процесса."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.context = multiprocessing.get_context('spawn')
+
+    def run_processes(self, target, *args):
+        start = self.context.Barrier(2)
+        processes = [
+            self.context.Process(
+                target=target, args=(self.location, name, start, *args)
+            )
+            for name in ('first', 'second')
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+    def test_journal_numbers_unique(self):
+        """Тест записей журнала без пропусков и перезаписи."""
+        self.run_processes(write_keys, WRITES)
+        cache = TieredCache(self.location, {})
+        self.assertEqual(cache.journal.get(SEQUENCE_KEY), WRITES * 2)
+        entries = cache.journal.get_many([
+            JOURNAL_KEY.format(number) for number in range(1, WRITES * 2 + 1)
+        ]).values()
+        self.assertEqual(
+            sorted(entry[0] for entry in entries),
+            list(range(1, WRITES * 2 + 1))
+        )
+        self.assertEqual({entry[2] for entry in entries}, {
+            cache.make_key(f'{name}:{number}')
+            for name in ('first', 'second') for number in range(WRITES)
+        })
+
+    def test_get_or_set_computes_once(self):
+        """Тест одного пересчета значения на два процесса."""
+        marker = os.path.join(self.location, 'computed')
+        self.run_processes(compute_value, marker)
+        with open(marker) as marker_file:
+            self.assertEqual(len(marker_file.readlines()), 1)
+        self.assertEqual(TieredCache(self.location, {}).get('hot'), 'value')
@@ -1,5 +1,6 @@
 from django.test import TestCase, Client
 
+
 UNEXISTING_PAGE_URL = '/ThisPageIsALieAndTheTestAsWell/'
 
 
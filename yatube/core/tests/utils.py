@@ -0,0 +1,16 @@
+# Кэш тестов: общий уровень и журнал в памяти, чтобы кэш не переживал
+# запуск тестов и не смешивался с кэшем запущенного сайта
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'tests',
+        'OPTIONS': {
+            'L2': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'L1_MAX_ENTRIES': 500,
+            'L1_TIMEOUT': 60,
+            'SYNC_INTERVAL': 1,
+        },
+    }
+}
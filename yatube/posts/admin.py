@@ -1,9 +1,34 @@
+import hashlib
+
+from django import forms
 from django.contrib import admin
 
 from .models import Post, Group
+from .paginators import CountingPaginator
+from .search import search_filter
+from .settings import APPROXIMATE_COUNT_TIMEOUT
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """
+    Список объектов без COUNT(*) на каждую загрузку: общее число объектов
+    не выводится, а число отобранных кэшируется по тексту запроса на
+    APPROXIMATE_COUNT_TIMEOUT и может немного отставать.
+    """
+    show_full_result_count = False
 
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        sql = str(queryset.query).encode()
+        return CountingPaginator(
+            queryset,
+            per_page,
+            count_key=f'admin_count:{hashlib.md5(sql).hexdigest()}',
+            count_timeout=APPROXIMATE_COUNT_TIMEOUT,
+        )
 
-class PostAdmin(admin.ModelAdmin):
+
+class PostAdmin(EstimatedCountAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,12 +37,41 @@ class PostAdmin(admin.ModelAdmin):
         'group'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('created',)
+    date_hierarchy = 'created'
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """
+        В списке постов варианты группы загружаются одним запросом на
+        страницу, а не на каждую строку. В форме поста группа и автор
+        выбираются через autocomplete.
+        """
+        url_name = request.resolver_match.url_name
+        if db_field.name != 'group' or not url_name.endswith('_changelist'):
+            return super().formfield_for_foreignkey(
+                db_field, request, **kwargs
+            )
+        kwargs['widget'] = forms.Select
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if not hasattr(request, 'group_choices'):
+            request.group_choices = [('', field.empty_label), *(
+                Group.objects.order_by('title').values_list('id', 'title')
+            )]
+        field.choices = request.group_choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту через полнотекстовый индекс"""
+        if not search_term:
+            return queryset, False
+        return search_filter(queryset, search_term), False
+
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(EstimatedCountAdmin):
     """Дополнительный класс для удобства работы с группами в админке"""
     prepopulated_fields = {"slug": ("title",)}
     list_display = (
@@ -26,7 +80,8 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description'
     )
-    search_fields = ('title',)
+    search_fields = ('title', 'slug')
+    ordering = ('title',)
     empty_value_display = '-пусто-'
 
 
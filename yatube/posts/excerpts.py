@@ -0,0 +1,19 @@
+from django.template.defaultfilters import linebreaks_filter, truncatechars
+
+from .settings import POST_EXCERPT_LENGTH
+
+
+def render_excerpt(text):
+    """
+    Начало текста поста для карточек лент: HTML с экранированием и
+    переносами строк и признак того, что текст сокращен.
+    """
+    excerpt = linebreaks_filter(
+        truncatechars(text, POST_EXCERPT_LENGTH), autoescape=True
+    )
+    return str(excerpt), len(text) > POST_EXCERPT_LENGTH
+
+
+def set_excerpt(post):
+    """Заполняет начало текста поста по его полному тексту."""
+    post.excerpt, post.is_truncated = render_excerpt(post.text)
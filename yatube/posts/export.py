@@ -0,0 +1,62 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Group, Post
+from .settings import EXPORT_CHUNK_SIZE
+
+
+def parse_moment(value):
+    """Разбирает дату или дату со временем из ISO-строки."""
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Некорректная дата: {value}')
+        moment = timezone.datetime.combine(date, timezone.datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def serialize(querysets, chunk_size):
+    for record_type, queryset, fields in querysets:
+        for row in queryset.values(*fields).iterator(chunk_size=chunk_size):
+            row['type'] = record_type
+            yield json.dumps(
+                row, cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + '\n'
+
+
+def export_lines(since=None, until=None, author=None, group=None,
+                 chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчно выгружает группы, посты и комментарии в формате JSON Lines.
+    Фильтры (даты создания, username автора, slug группы) отбирают посты,
+    комментарии выгружаются к отобранным постам. Строки читаются из БД
+    порциями по chunk_size, поэтому память не растет с размером таблиц.
+    Некорректная дата вызывает ValueError сразу, до начала выгрузки.
+    """
+    groups = Group.objects.order_by('id')
+    posts = Post.objects.order_by('id')
+    if since:
+        posts = posts.filter(created__gte=parse_moment(since))
+    if until:
+        posts = posts.filter(created__lt=parse_moment(until))
+    if author:
+        posts = posts.filter(author__username=author)
+    if group:
+        groups = groups.filter(slug=group)
+        posts = posts.filter(group__slug=group)
+    comments = Comment.objects.filter(post__in=posts.values('id'))
+    return serialize((
+        ('group', groups, ('id', 'title', 'slug', 'description')),
+        ('post', posts, (
+            'id', 'created', 'text', 'author__username', 'group_id', 'image'
+        )),
+        ('comment', comments.order_by('id'), (
+            'id', 'created', 'text', 'author__username', 'post_id'
+        )),
+    ), chunk_size)
@@ -0,0 +1,315 @@
+import heapq
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Subquery
+
+from .models import Follow, Post, TimelineEntry
+from .settings import (
+    APPROXIMATE_COUNT_TIMEOUT,
+    AUTHOR_TIMELINE_CACHE_TIMEOUT,
+    AUTHOR_TIMELINE_LENGTH,
+    FEED_COUNT_TIMEOUT,
+    FOLLOW_GRAPH_CACHE_TIMEOUT,
+    MERGED_FEED_LENGTH,
+    TIMELINE_LENGTH,
+)
+
+
+FEED_POST_FIELDS = (
+    'excerpt',
+    'is_truncated',
+    'created',
+    'image',
+    'image_width',
+    'image_height',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+def feed_posts(posts):
+    """
+    Общий queryset для лент постов: автор и группа загружаются тем же
+    запросом, что и посты, и только с полями, нужными карточке поста.
+    """
+    return posts.select_related('author', 'group').only(*FEED_POST_FIELDS)
+
+
+def feed_version_key(scope):
+    return f'feed_version:{scope}'
+
+
+def get_feed_version(scope):
+    """
+    Версия ленты (index, group:<id>, author:<id>) или подписок пользователя
+    (follows:<id>) для ключей кэша и валидаторов HTTP. Версия - время
+    последней записи в наносекундах, поэтому вытесненная из кэша версия
+    не совпадет с прежней.
+    """
+    return cache.get_or_set(feed_version_key(scope), time.time_ns, None)
+
+
+def bump_versions(*scopes):
+    """Меняет версии лент на текущее время."""
+    version = time.time_ns()
+    cache.set_many(
+        {feed_version_key(scope): version for scope in scopes}, None
+    )
+
+
+def bump_feed_versions(post):
+    """Меняет версии всех лент, в которых показывается пост."""
+    scopes = {'index', f'author:{post.author_id}'}
+    for group_id in (post.group_id, getattr(post, '_initial_group_id', None)):
+        if group_id:
+            scopes.add(f'group:{group_id}')
+    bump_versions(*scopes)
+
+
+def bump_image_feed_versions(names, batch_size=500):
+    """
+    Меняет версии лент с постами, у которых картинки из names, например
+    после массового создания миниатюр или переноса файлов.
+    """
+    if not names:
+        return
+    scopes = {'index'}
+    names = list(names)
+    for start in range(0, len(names), batch_size):
+        for author_id, group_id in Post.objects.filter(
+            image__in=names[start:start + batch_size]
+        ).values_list('author_id', 'group_id'):
+            scopes.add(f'author:{author_id}')
+            if group_id:
+                scopes.add(f'group:{group_id}')
+    bump_versions(*scopes)
+
+
+def feed_count_options(scope, version):
+    """
+    Параметры CountingPaginator для ленты: число постов кэшируется до смены
+    версии ленты. В приближенном режиме число постов главной страницы
+    кэшируется на APPROXIMATE_COUNT_TIMEOUT без учета версии.
+    """
+    if scope == 'index' and settings.INDEX_COUNT_APPROXIMATE:
+        return {
+            'count_key': 'feed_count:index',
+            'count_timeout': APPROXIMATE_COUNT_TIMEOUT,
+        }
+    return {
+        'count_key': f'feed_count:{scope}:{version}',
+        'count_timeout': FEED_COUNT_TIMEOUT,
+    }
+
+
+def trim_timeline(user_id):
+    """Обрезает ленту подписок пользователя до TIMELINE_LENGTH записей."""
+    TimelineEntry.objects.filter(
+        id__in=Subquery(
+            TimelineEntry.objects.filter(
+                user_id=user_id
+            ).order_by('-created', '-post_id').values('id')[TIMELINE_LENGTH:]
+        )
+    ).delete()
+
+
+def trim_timelines(user_ids):
+    """
+    Обрезает ленты подписок тех пользователей из user_ids (списка или
+    queryset), у которых больше TIMELINE_LENGTH записей.
+    """
+    overflowing = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).order_by().values('user_id').annotate(
+        total=Count('id')
+    ).filter(total__gt=TIMELINE_LENGTH).values_list('user_id', flat=True)
+    for user_id in overflowing:
+        trim_timeline(user_id)
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in followers.values_list('user_id', flat=True)
+        ),
+        ignore_conflicts=True
+    )
+    trim_timelines(followers.values('user_id'))
+
+
+def backfill_timeline(user_id, author_id=None):
+    """
+    Заполняет ленту подписок пользователя свежими постами автора
+    (или всех авторов, на которых он подписан).
+    """
+    posts = Post.objects.filter(
+        author_id__in=[author_id] if author_id else Follow.objects.filter(
+            user_id=user_id
+        ).values('author_id')
+    ).values_list('id', 'created')[:TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts
+        ),
+        ignore_conflicts=True
+    )
+    trim_timeline(user_id)
+
+
+def remove_from_timeline(user_id, author_id):
+    """Убирает посты автора из ленты подписок пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def author_timeline_key(author_id):
+    return f'author_timeline:{author_id}'
+
+
+def get_author_timelines(author_ids):
+    """
+    Возвращает кэшированные списки свежих постов авторов в виде пар
+    (created, id), отсортированных по убыванию. Промахи кэша заполняются
+    из БД.
+    """
+    keys = {author_timeline_key(author_id): author_id
+            for author_id in author_ids}
+    timelines = cache.get_many(keys)
+    missing = {
+        key: list(Post.objects.filter(
+            author_id=author_id
+        ).order_by('-created', '-id').values_list(
+            'created', 'id'
+        )[:AUTHOR_TIMELINE_LENGTH])
+        for key, author_id in keys.items() if key not in timelines
+    }
+    if missing:
+        cache.set_many(missing, AUTHOR_TIMELINE_CACHE_TIMEOUT)
+        timelines.update(missing)
+    return list(timelines.values())
+
+
+def push_to_author_timeline(post):
+    """Добавляет новый пост в кэшированный список постов автора."""
+    key = author_timeline_key(post.author_id)
+    timeline = cache.get(key)
+    if timeline is not None:
+        cache.set(
+            key,
+            [(post.created, post.id)] + timeline[:AUTHOR_TIMELINE_LENGTH - 1],
+            AUTHOR_TIMELINE_CACHE_TIMEOUT
+        )
+
+
+def drop_author_timeline(author_id):
+    """Сбрасывает кэшированный список постов автора."""
+    cache.delete(author_timeline_key(author_id))
+
+
+def followed_authors_key(user_id):
+    return f'followed_authors:{user_id}'
+
+
+def get_followed_author_ids(user_id):
+    """Кэшированное множество id авторов, на которых подписан пользователь."""
+    return cache.get_or_set(
+        followed_authors_key(user_id),
+        lambda: set(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)),
+        FOLLOW_GRAPH_CACHE_TIMEOUT
+    )
+
+
+def drop_followed_author_ids(user_id):
+    """Сбрасывает кэш подписок пользователя."""
+    cache.delete(followed_authors_key(user_id))
+
+
+def follow_author(user_id, author_id):
+    """
+    Подписывает пользователя на автора одним INSERT: повторная подписка
+    упирается в уникальное ограничение и ничего не меняет. Возвращает
+    True, если подписка создана.
+    """
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user_id=user_id, author_id=author_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow_author(user_id, author_id):
+    """Отписывает пользователя от автора. True, если подписка была."""
+    deleted, _ = Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+    return bool(deleted)
+
+
+def join_feed(user):
+    """Лента подписок через соединение с таблицей подписок."""
+    return Post.objects.filter(author__following__user=user)
+
+
+def timeline_feed(user):
+    """Лента подписок из материализованной ленты (fan-out on write)."""
+    return Post.objects.filter(timeline_entries__user=user)
+
+
+def timeline_keys(user):
+    """
+    Записи материализованной ленты подписок пользователя: страница ленты
+    по курсору выбирается из них одним чтением индекса
+    (user, -created, -post), а посты загружаются по id.
+    """
+    return TimelineEntry.objects.filter(user=user)
+
+
+def merge_feed(user):
+    """
+    Лента подписок слиянием кэшированных списков постов авторов
+    (fan-out on read). Победившие id загружаются одним запросом.
+    """
+    author_ids = list(get_followed_author_ids(user.id))
+    merged = heapq.merge(*get_author_timelines(author_ids), reverse=True)
+    post_ids = [post_id for _, post_id in islice(merged, MERGED_FEED_LENGTH)]
+    return Post.objects.filter(id__in=post_ids, author_id__in=author_ids)
+
+
+FOLLOW_FEED_ENGINES = {
+    'join': join_feed,
+    'timeline': timeline_feed,
+    'merge': merge_feed,
+}
+
+
+def follow_feed(user):
+    """Лента постов избранных авторов движком из FOLLOW_FEED_ENGINE."""
+    return FOLLOW_FEED_ENGINES[settings.FOLLOW_FEED_ENGINE](user)
+
+
+def uses_timeline():
+    return settings.FOLLOW_FEED_ENGINE == 'timeline'
+
+
+def follow_feed_keys(user):
+    """
+    Записи, по которым CursorPaginator выбирает страницу ленты подписок,
+    либо None, если страница выбирается из самих постов.
+    """
+    return timeline_keys(user) if uses_timeline() else None
@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
 from .models import Post, Comment
+from .settings import IMAGE_MAX_UPLOAD_SIZE
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +11,16 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if (isinstance(image, UploadedFile)
+                and image.size > IMAGE_MAX_UPLOAD_SIZE):
+            raise forms.ValidationError(
+                'Картинка больше '
+                f'{filesizeformat(IMAGE_MAX_UPLOAD_SIZE)}'
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,114 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+from .settings import IMAGE_MAX_SIDE, IMAGE_QUALITY, IMAGE_RELEASE_GRACE
+from .storage import is_hashed_name
+
+logger = logging.getLogger(__name__)
+
+# Поля поста с метаданными картинки
+IMAGE_FIELDS = ('image_width', 'image_height', 'image_format', 'image_size')
+
+
+def image_metadata(file):
+    """
+    Размеры, формат и размер файла картинки. Pillow читает только
+    заголовок файла, картинка целиком не декодируется.
+    """
+    file.open('rb')
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format or ''
+        return {
+            'image_width': width,
+            'image_height': height,
+            'image_format': image_format,
+            'image_size': file.size,
+        }
+    finally:
+        file.seek(0)
+
+
+def set_image_metadata(post):
+    """Заполняет метаданные картинки поста или очищает их без картинки."""
+    if post.image:
+        metadata = image_metadata(post.image)
+    else:
+        metadata = dict.fromkeys(IMAGE_FIELDS)
+        metadata['image_format'] = ''
+    for field, value in metadata.items():
+        setattr(post, field, value)
+
+
+def optimize_image(file):
+    """
+    Готовит загруженную картинку к хранению: поворачивает по EXIF,
+    уменьшает до IMAGE_MAX_SIDE по большей стороне и перекодирует в WebP
+    без метаданных. Анимированные картинки возвращаются как есть.
+    """
+    file.open('rb')
+    file.seek(0)
+    with Image.open(file) as source:
+        if getattr(source, 'is_animated', False):
+            file.seek(0)
+            return None
+        image = ImageOps.exif_transpose(source)
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=IMAGE_QUALITY)
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(buffer.getvalue(), name=f'{name}.webp')
+
+
+def prepare_image(post):
+    """
+    Оптимизирует новую картинку поста и заполняет ее метаданные. Уже
+    сохраненная картинка не трогается.
+    """
+    if post.image and post.image._committed:
+        return
+    if post.image:
+        optimized = optimize_image(post.image)
+        if optimized is not None:
+            post.image = optimized
+    set_image_metadata(post)
+
+
+def release_image(name):
+    """
+    Удаляет файл картинки и его миниатюры, если на файл больше не
+    ссылается ни один пост. Одинаковые картинки хранятся одним файлом,
+    поэтому число ссылок - число постов с этим именем файла. Файлы,
+    сохраненные не хранилищем по хэшу содержимого, не удаляются.
+
+    Файл, сохраненный (в том числе повторно) за последние
+    IMAGE_RELEASE_GRACE секунд, тоже не удаляется: пост с той же
+    картинкой мог еще не закончить транзакцию. Оставшиеся без ссылок
+    файлы позже удаляет команда sweep_images.
+    """
+    if not name or not is_hashed_name(name):
+        return
+    storage = Post._meta.get_field('image').storage
+    with storage.lock():
+        if (
+            storage.saved_within(name, IMAGE_RELEASE_GRACE)
+            or Post.objects.filter(image=name).exists()
+        ):
+            return
+        try:
+            delete_thumbnails(ImageFile(name, storage))
+        except (OSError, SuspiciousFileOperation):
+            logger.exception('Не удалось удалить картинку %s', name)
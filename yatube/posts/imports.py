@@ -0,0 +1,281 @@
+import csv
+import json
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Max
+
+from .export import parse_moment
+from .models import Comment, Follow, Group, ImportedRecord, Post, User
+
+
+@contextmanager
+def explicit_created(*models):
+    """Позволяет задать дату создания объектов при массовой вставке."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def read_records(path):
+    """
+    Построчно читает записи из файла JSON Lines (формат export_posts)
+    или CSV с заголовком. Пустые значения CSV считаются отсутствующими.
+    """
+    with open(path, encoding='utf-8', newline='') as source:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(source):
+                yield {key: value or None for key, value in row.items()}
+            return
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def insert_objects(model, objects, key_fields):
+    """
+    Вставляет объекты пачкой и проставляет им id. Если БД не возвращает
+    id из массовой вставки, они находятся по полям key_fields среди только
+    что вставленных строк, а объекты с одинаковыми значениями этих полей
+    сохраняются по одному.
+    """
+    def key(obj):
+        return tuple(getattr(obj, field) for field in key_fields)
+
+    if not objects:
+        return
+    counts = Counter(key(obj) for obj in objects)
+    batch = [obj for obj in objects if counts[key(obj)] == 1]
+    last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    model.objects.bulk_create(batch)
+    if any(obj.pk is None for obj in batch):
+        ids = {
+            row[:-1]: row[-1]
+            for row in model.objects.filter(id__gt=last_id).values_list(
+                *key_fields, 'id'
+            )
+        }
+        for obj in batch:
+            obj.pk = ids[key(obj)]
+    for obj in objects:
+        if obj.pk is None:
+            # Как в loaddata: обработчики сигналов пропускают raw-записи
+            obj.save_base(raw=True)
+
+
+class Importer:
+    """
+    Пакетная вставка групп, постов, комментариев и подписок из источника
+    source (например, файла). Авторы разрешаются по username, группы - по
+    slug, недостающие пользователи и группы создаются. Посты и комментарии
+    получают новые id. Id групп, постов и комментариев источника
+    сопоставляются с id в БД, сопоставление сохраняется в ImportedRecord,
+    поэтому повторный или продолженный импорт того же источника ничего не
+    дублирует. Повторы записей с тем же id и записи, ссылающиеся на
+    отсутствующие в источнике посты или группы, пропускаются как
+    конфликты.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.user_ids = dict(User.objects.values_list('username', 'id'))
+        self.group_ids = dict(Group.objects.values_list('slug', 'id'))
+        # Тип записи -> id записей источника -> id в БД
+        self.object_ids = {'group': {}, 'post': {}, 'comment': {}}
+        self.imported = 0
+        self.existing = 0
+        self.feed_group_ids = set()
+        self.author_ids = set()
+        self.follower_ids = set()
+
+    def resolve_users(self, records):
+        usernames = {
+            record[field] for record in records
+            for field in ('author__username', 'user__username')
+            if record.get(field)
+        } - self.user_ids.keys()
+        if not usernames:
+            return
+        User.objects.bulk_create(
+            (User(username=username) for username in usernames),
+            ignore_conflicts=True
+        )
+        self.user_ids.update(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+
+    def find_objects(self, record_type, source_ids):
+        """
+        Сопоставление id записей источника с id в БД, дополненное
+        сохраненным сопоставлением для source_ids.
+        """
+        known = self.object_ids[record_type]
+        missing = set(source_ids) - known.keys()
+        if missing:
+            known.update(ImportedRecord.objects.filter(
+                source=self.source,
+                record_type=record_type,
+                source_id__in=missing,
+            ).values_list('source_id', 'object_id'))
+        return known
+
+    def remember(self, record_type, object_ids):
+        """Сохраняет сопоставление id записей источника с id в БД."""
+        self.object_ids[record_type].update(object_ids)
+        ImportedRecord.objects.bulk_create(
+            ImportedRecord(
+                source=self.source,
+                record_type=record_type,
+                source_id=source_id,
+                object_id=object_id,
+            )
+            for source_id, object_id in object_ids.items()
+        )
+
+    def new_records(self, record_type, records, conflicts):
+        """
+        Еще не импортированные записи порции: id в источнике -> (номер
+        записи, запись). Повторы id в порции - конфликты.
+        """
+        known = self.find_objects(
+            record_type, [int(record['id']) for _, record in records]
+        )
+        new = {}
+        for index, record in records:
+            source_id = int(record['id'])
+            if source_id in new:
+                conflicts.append((index, f'повтор записи с id {source_id}'))
+            elif source_id in known:
+                self.existing += 1
+            else:
+                new[source_id] = (index, record)
+        return new
+
+    def import_groups(self, records, conflicts):
+        new = self.new_records('group', records, conflicts)
+        groups = {}
+        for _, record in new.values():
+            if record['slug'] not in self.group_ids:
+                groups[record['slug']] = Group(
+                    title=record['title'],
+                    slug=record['slug'],
+                    description=record['description'],
+                )
+        Group.objects.bulk_create(groups.values(), ignore_conflicts=True)
+        self.imported += len(groups)
+        self.existing += len(new) - len(groups)
+        self.group_ids.update(Group.objects.filter(
+            slug__in=[record['slug'] for _, record in new.values()]
+        ).values_list('slug', 'id'))
+        self.remember('group', {
+            source_id: self.group_ids[record['slug']]
+            for source_id, (_, record) in new.items()
+        })
+
+    def import_posts(self, records, conflicts):
+        new = self.new_records('post', records, conflicts)
+        group_ids = self.find_objects('group', [
+            int(record['group_id']) for _, record in new.values()
+            if record.get('group_id')
+        ])
+        posts = {}
+        for source_id, (index, record) in new.items():
+            group_id = record.get('group_id')
+            if group_id and int(group_id) not in group_ids:
+                conflicts.append(
+                    (index, f'пост к неизвестной группе {group_id}')
+                )
+                continue
+            posts[source_id] = Post(
+                created=parse_moment(record['created']),
+                text=record['text'],
+                author_id=self.user_ids[record['author__username']],
+                group_id=group_id and group_ids[int(group_id)],
+                image=record.get('image') or '',
+            )
+        insert_objects(Post, list(posts.values()), ('author_id', 'created'))
+        self.remember('post', {
+            source_id: post.pk for source_id, post in posts.items()
+        })
+        self.imported += len(posts)
+        self.author_ids.update(post.author_id for post in posts.values())
+        self.feed_group_ids.update(
+            post.group_id for post in posts.values() if post.group_id
+        )
+
+    def import_comments(self, records, conflicts):
+        new = self.new_records('comment', records, conflicts)
+        post_ids = self.find_objects('post', [
+            int(record['post_id']) for _, record in new.values()
+        ])
+        comments = {}
+        for source_id, (index, record) in new.items():
+            post_id = post_ids.get(int(record['post_id']))
+            if post_id is None:
+                conflicts.append(
+                    (index, f'комментарий к неизвестному посту '
+                            f'{record["post_id"]}')
+                )
+                continue
+            comments[source_id] = Comment(
+                created=parse_moment(record['created']),
+                text=record['text'],
+                author_id=self.user_ids[record['author__username']],
+                post_id=post_id,
+            )
+        insert_objects(
+            Comment, list(comments.values()),
+            ('post_id', 'author_id', 'created')
+        )
+        self.remember('comment', {
+            source_id: comment.pk for source_id, comment in comments.items()
+        })
+        self.imported += len(comments)
+
+    def import_follows(self, records):
+        pairs = set()
+        for record in records:
+            user_id = self.user_ids[record['user__username']]
+            pairs.add((user_id, self.user_ids[record['author__username']]))
+            self.follower_ids.add(user_id)
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}
+        ).values_list('user_id', 'author_id')) & pairs
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs - existing
+            ),
+            ignore_conflicts=True
+        )
+        self.imported += len(pairs - existing)
+        self.existing += len(records) - len(pairs - existing)
+
+    def import_chunk(self, records):
+        """
+        Вставляет порцию записей в одной транзакции и возвращает конфликты:
+        пары (номер записи в порции, описание).
+        """
+        by_type = {'group': [], 'post': [], 'comment': [], 'follow': []}
+        for index, record in enumerate(records):
+            record_type = record.get('type')
+            if record_type not in by_type:
+                raise ValueError(f'Неизвестный тип записи: {record_type}')
+            by_type[record_type].append((index, record))
+        conflicts = []
+        with transaction.atomic():
+            self.resolve_users(records)
+            self.import_groups(by_type['group'], conflicts)
+            with explicit_created(Post, Comment):
+                self.import_posts(by_type['post'], conflicts)
+                self.import_comments(by_type['comment'], conflicts)
+            self.import_follows(
+                [record for _, record in by_type['follow']]
+            )
+        return sorted(conflicts)
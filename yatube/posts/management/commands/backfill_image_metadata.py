@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import IMAGE_FIELDS, set_image_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, формат и размер файла картинок постов, '
+        'загруженных до появления этих полей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать метаданные всех картинок',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('id', 'image')
+        if not options['all']:
+            posts = posts.filter(image_width__isnull=True)
+        batch = []
+        updated = errors = 0
+        for post in posts.order_by('id').iterator():
+            try:
+                set_image_metadata(post)
+            except (OSError, SyntaxError, ValueError) as error:
+                errors += 1
+                self.stderr.write(f'Пост {post.id}, {post.image}: {error}')
+                continue
+            finally:
+                post.image.close()
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                updated += self.save(batch)
+        updated += self.save(batch)
+        message = f'Обновлено постов: {updated}, ошибок: {errors}'
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(message))
+
+    def save(self, batch):
+        Post.objects.bulk_update(batch, IMAGE_FIELDS)
+        count = len(batch)
+        batch.clear()
+        return count
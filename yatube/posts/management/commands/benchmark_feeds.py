@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.feeds import backfill_timeline
+from posts.imports import explicit_created
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.paginators import encode_cursor
+from posts.stats import rebuild_user_stats
+from posts.settings import POSTS_ON_PAGE
+
+# Модели, индексы лент которых (Meta.indexes) удаляются и создаются
+# заново для сравнения
+FEED_INDEX_MODELS = (Post, Comment, Follow, TimelineEntry)
+
+
+def drop_feed_indexes():
+    with connection.schema_editor() as editor:
+        for model in FEED_INDEX_MODELS:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+
+def create_feed_indexes():
+    with connection.schema_editor() as editor:
+        for model in FEED_INDEX_MODELS:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельную тестовую БД большим набором постов и выводит '
+        'планы запросов (EXPLAIN QUERY PLAN) и время ответа страниц лент '
+        'без индексов лент и с ними'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}):
+                cases = self.seed(options)
+                for title, change_indexes in (
+                    ('Без индексов лент', drop_feed_indexes),
+                    ('С индексами лент', create_feed_indexes),
+                ):
+                    change_indexes()
+                    self.stdout.write(self.style.MIGRATE_HEADING(title))
+                    for case in cases:
+                        self.run_case(*case, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        """Заполняет БД и возвращает проверяемые страницы."""
+        started = time.perf_counter()
+        User.objects.bulk_create(
+            User(username=f'bench_user_{num}')
+            for num in range(options['users'])
+        )
+        users = list(User.objects.all())
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {num}',
+                slug=f'bench-group-{num}',
+                description='Группа для бенчмарка'
+            ) for num in range(options['groups'])
+        )
+        groups = list(Group.objects.all())
+        now = timezone.now()
+        with explicit_created(Post):
+            Post.objects.bulk_create(
+                Post(
+                    text=f'Пост для бенчмарка № {num}',
+                    author=random.choice(users),
+                    group=random.choice(groups + [None]),
+                    created=now - timedelta(minutes=num),
+                ) for num in range(options['posts'])
+            )
+        reader = users[0]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author)
+            for author in random.sample(
+                users[1:], min(options['follows'], len(users) - 1)
+            )
+        )
+        backfill_timeline(reader.id)
+        rebuild_user_stats()
+        self.stdout.write(
+            f'База заполнена за {time.perf_counter() - started:.1f} с: '
+            f'{Post.objects.count()} постов'
+        )
+
+        guest = Client()
+        client = Client()
+        client.force_login(reader)
+        deep_page = Post.objects.count() // POSTS_ON_PAGE // 2
+        deep_post = Post.objects.order_by('-created', '-id')[
+            deep_page * POSTS_ON_PAGE
+        ]
+        author = users[1]
+        group = groups[0]
+        post = Post.objects.filter(author=author).first()
+        index_url = reverse('posts:index')
+        return [
+            ('index', guest, index_url),
+            ('index ?page', guest, f'{index_url}?page={deep_page}'),
+            (
+                'index ?after',
+                guest,
+                f'{index_url}?after={encode_cursor(deep_post)}'
+            ),
+            (
+                'group_posts',
+                guest,
+                reverse('posts:group_list', args=[group.slug])
+            ),
+            (
+                'profile',
+                guest,
+                reverse('posts:profile', args=[author.username])
+            ),
+            (
+                'post_detail',
+                guest,
+                reverse('posts:post_detail', args=[post.id])
+            ),
+            ('follow_index', client, reverse('posts:follow_index')),
+        ]
+
+    def run_case(self, name, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                client.get(url)
+                timings.append(time.perf_counter() - started)
+        self.stdout.write(self.style.SQL_TABLE(
+            f'{name} ({url}): {statistics.median(timings) * 1000:.1f} мс, '
+            f'{len(context.captured_queries)} запросов'
+        ))
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                self.stdout.write(f'  {sql[:120]}')
+                for row in cursor.fetchall():
+                    self.stdout.write(f'    {row[-1]}')
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+
+from posts.feeds import feed_posts
+from posts.models import Post, User
+from posts.search import SearchPaginator, rebuild_search_index
+from posts.settings import POSTS_ON_PAGE
+
+WORDS = (
+    'кот собака погода город река лес море поезд книга музыка кино чай '
+    'кофе утро вечер зима лето осень весна друг работа дом сад дорога '
+    'солнце дождь снег ветер небо звезда'
+).split()
+# Слово, которое встречается примерно в одном посте из RARE_WORD_RATE
+RARE_WORD = 'редкость'
+RARE_WORD_RATE = 1000
+# Порция постов, вставляемых одной транзакцией при заполнении базы
+SEED_CHUNK_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельную тестовую БД большим набором постов и сравнивает '
+        'время поиска через индекс FTS5 с поиском подстроки (LIKE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--query',
+            action='append',
+            help='Поисковый запрос, можно указать несколько раз',
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}):
+                self.seed(options['posts'])
+                queries = options['query'] or ['кот', 'зима море', RARE_WORD]
+                for query in queries:
+                    self.run_case(query, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count):
+        started = time.perf_counter()
+        author = User.objects.create(username='bench_author')
+        posts = (
+            Post(
+                author=author,
+                text=' '.join(
+                    random.choices(WORDS, k=random.randint(5, 60))
+                    + [RARE_WORD] * (random.randrange(RARE_WORD_RATE) == 0)
+                )
+            ) for _ in range(count)
+        )
+        while True:
+            chunk = list(islice(posts, SEED_CHUNK_SIZE))
+            if not chunk:
+                break
+            with transaction.atomic():
+                Post.objects.bulk_create(chunk)
+        rebuild_search_index()
+        self.stdout.write(
+            f'База заполнена за {time.perf_counter() - started:.1f} с: '
+            f'{count} постов'
+        )
+
+    def measure(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def run_case(self, query, repeat):
+        words = query.split()
+        like = Post.objects.all()
+        for word in words:
+            like = like.filter(text__icontains=word)
+        cases = (
+            ('FTS5, первая страница по BM25', lambda: list(
+                SearchPaginator(query, POSTS_ON_PAGE).get_page()
+            )),
+            ('LIKE, первая страница по дате', lambda: list(
+                feed_posts(like).order_by('-created', '-id')[:POSTS_ON_PAGE]
+            )),
+            ('LIKE, число совпадений', like.count),
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Запрос «{query}»'))
+        for name, function in cases:
+            self.stdout.write(self.style.SQL_TABLE(
+                f'  {name}: {self.measure(function, repeat):.1f} мс'
+            ))
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from posts.storage import hashed_name
+
+
+def flat_name(digest):
+    return f'posts/{digest}.webp'
+
+
+def sharded_name(digest):
+    return hashed_name('posts/image.webp', digest)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время создания и поиска файлов картинок в одном '
+        'каталоге и в шардированных по хэшу каталогах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=1000000)
+        parser.add_argument('--lookups', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        digests = [
+            hashlib.sha256(str(num).encode()).hexdigest()
+            for num in range(options['files'])
+        ]
+        for title, name in (
+            ('Один каталог', flat_name),
+            ('Шардирование по хэшу', sharded_name),
+        ):
+            location = tempfile.mkdtemp()
+            try:
+                self.stdout.write(self.style.MIGRATE_HEADING(title))
+                self.run_case(
+                    FileSystemStorage(location=location),
+                    [name(digest) for digest in digests],
+                    options['lookups'],
+                )
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+
+    def run_case(self, storage, names, lookups):
+        content = ContentFile(b'\0' * 64)
+        started = time.perf_counter()
+        for name in names:
+            storage.save(name, content)
+        create = (time.perf_counter() - started) / len(names)
+        sample = random.sample(names, min(lookups, len(names)))
+        timings = []
+        for name in sample:
+            started = time.perf_counter()
+            storage.exists(name)
+            os.stat(storage.path(name))
+            timings.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        listed = len(os.listdir(os.path.dirname(storage.path(names[0]))))
+        listing = time.perf_counter() - started
+        self.stdout.write(self.style.SQL_TABLE(
+            f'  создание: {create * 10 ** 6:.1f} мкс/файл, поиск: '
+            f'{statistics.median(timings) * 10 ** 6:.1f} мкс (медиана), '
+            f'чтение каталога ({listed} записей): {listing * 1000:.1f} мс'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import export_lines
+from posts.settings import EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты и комментарии в формате JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Посты, созданные с этой даты')
+        parser.add_argument('--until', help='Посты, созданные до этой даты')
+        parser.add_argument('--author', help='username автора постов')
+        parser.add_argument('--group', help='slug группы постов')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_lines(
+                since=options['since'],
+                until=options['until'],
+                author=options['author'],
+                group=options['group'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(lines)
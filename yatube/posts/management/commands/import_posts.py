@@ -0,0 +1,116 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts.feeds import (
+    bump_versions,
+    drop_author_timeline,
+    drop_followed_author_ids,
+    uses_timeline,
+)
+from posts.imports import Importer, read_records
+from posts.search import rebuild_search_index
+from posts.settings import IMPORT_CHUNK_SIZE
+from posts.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, посты, комментарии и подписки из файла JSON '
+        'Lines (формат export_posts) или CSV пакетными вставками. Повторный '
+        'импорт того же источника (--source, по умолчанию имя файла) '
+        'идемпотентен, с --checkpoint прерванный импорт продолжается с '
+        'последней сохраненной порции'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--source',
+            help='Имя источника, по которому узнаются импортированные '
+                 'записи (по умолчанию имя файла)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом уже импортированных записей',
+        )
+
+    def chunks(self, records, chunk_size, start):
+        """Порции записей вместе с номером первой записи порции."""
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+    def import_chunk(self, importer, start, chunk):
+        try:
+            return importer.import_chunk(chunk)
+        except (KeyError, ValueError, DatabaseError) as error:
+            raise CommandError(
+                f'Ошибка в записях {start + 1}-{start + len(chunk)}: '
+                f'{error!r}'
+            )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        chunk_size = options['chunk_size']
+        skip = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as source:
+                skip = int(source.read() or 0)
+            self.stdout.write(f'Продолжение импорта с записи {skip}')
+        records = islice(read_records(options['path']), skip, None)
+        importer = Importer(
+            options['source'] or os.path.basename(options['path'])
+        )
+        done = skip
+        conflicts = 0
+        started = time.perf_counter()
+        for start, chunk in self.chunks(records, chunk_size, skip):
+            for index, reason in self.import_chunk(importer, start, chunk):
+                self.stderr.write(
+                    f'Конфликт в записи {start + index + 1}: {reason}'
+                )
+                conflicts += 1
+            done = start + len(chunk)
+            if checkpoint:
+                with open(checkpoint, 'w') as target:
+                    target.write(str(done))
+            rate = (done - skip) / (time.perf_counter() - started)
+            self.stdout.write(f'{done} записей, {rate:.0f} записей/с')
+        self.finish(importer)
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {importer.imported}, '
+            f'уже было: {importer.existing}, конфликтов: {conflicts}'
+        ))
+
+    def finish(self, importer):
+        """
+        Массовая вставка обходит сигналы моделей, поэтому счетчики, ленты
+        подписок, поисковый индекс и кэши обновляются после импорта.
+        """
+        rebuild_user_stats()
+        rebuild_search_index()
+        if uses_timeline():
+            call_command('rebuild_timelines', stdout=self.stdout)
+        for author_id in importer.author_ids:
+            drop_author_timeline(author_id)
+        for user_id in importer.follower_ids:
+            drop_followed_author_ids(user_id)
+        bump_versions(
+            'index',
+            *(f'author:{author_id}' for author_id in importer.author_ids),
+            *(f'group:{group_id}' for group_id in importer.feed_group_ids),
+            *(f'follows:{user_id}' for user_id in importer.follower_ids),
+        )
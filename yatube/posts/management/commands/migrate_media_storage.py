@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts.feeds import bump_image_feed_versions
+from posts.models import Post
+from posts.storage import is_hashed_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, сохраненные до хранилища по хэшу '
+        'содержимого, в шардированные каталоги. Одинаковые файлы '
+        'сливаются в один, старые файлы и их миниатюры удаляются'
+    )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = [
+            name for name in Post.objects.exclude(image='').order_by(
+            ).values_list('image', flat=True).distinct()
+            if not is_hashed_name(name)
+        ]
+        moved = []
+        errors = 0
+        for name in names:
+            try:
+                with storage.open(name) as source:
+                    new_name = storage.save(name, source)
+            except Exception as error:
+                errors += 1
+                self.stderr.write(f'{name}: {type(error).__name__}: {error}')
+                continue
+            with transaction.atomic():
+                Post.objects.filter(image=name).update(image=new_name)
+            delete_thumbnails(ImageFile(name, storage))
+            moved.append(new_name)
+        bump_image_feed_versions(moved)
+        message = f'Перенесено файлов: {len(moved)}, ошибок: {errors}'
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(message))
+        if moved:
+            self.stdout.write(
+                'Миниатюры перенесенных картинок создаст warm_thumbnails'
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import backfill_timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные ленты подписок, например после '
+        'переключения FOLLOW_FEED_ENGINE на "timeline"'
+    )
+
+    def handle(self, *args, **options):
+        TimelineEntry.objects.all().delete()
+        user_ids = Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct()
+        for user_id in user_ids.iterator():
+            backfill_timeline(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты подписок пересобраны: {TimelineEntry.objects.count()}'
+        ))
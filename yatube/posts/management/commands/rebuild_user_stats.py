@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.stats import find_inconsistent_stats, rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, не исправляя их',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rebuild_user_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
+            return
+        inconsistent = find_inconsistent_stats()
+        for user_id, (stored, actual) in inconsistent.items():
+            self.stdout.write(
+                f'Пользователь {user_id}: сохранено {stored}, '
+                f'фактически {actual}'
+            )
+        if inconsistent:
+            raise CommandError(
+                f'Расхождения в счетчиках у {len(inconsistent)} '
+                'пользователей'
+            )
+        self.stdout.write(self.style.SUCCESS('Счетчики согласованы'))
@@ -0,0 +1,55 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts.images import release_image
+from posts.models import Post
+from posts.settings import IMAGE_RELEASE_GRACE
+from posts.storage import is_hashed_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок в хранилище по хэшу содержимого, на которые '
+        'не ссылается ни один пост, сохраненные раньше IMAGE_RELEASE_GRACE '
+        'секунд назад: например, картинки, замененные или удаленные вскоре '
+        'после загрузки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def stored_names(self, storage, directory):
+        """Имена файлов в каталоге хранилища и вложенных каталогах."""
+        if not storage.exists(directory):
+            return
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for subdirectory in directories:
+            yield from self.stored_names(
+                storage, f'{directory}/{subdirectory}'
+            )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        names = (
+            name
+            for name in self.stored_names(storage, field.upload_to.strip('/'))
+            if is_hashed_name(name)
+            and not storage.saved_within(name, IMAGE_RELEASE_GRACE)
+        )
+        released = 0
+        while True:
+            batch = set(islice(names, options['batch_size']))
+            if not batch:
+                break
+            batch -= set(Post.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for name in batch:
+                # Под блокировкой хранилища ссылки проверяются еще раз
+                release_image(name)
+                released += not storage.exists(name)
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {released}'))
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.feeds import bump_image_feed_versions
+from posts.models import Post
+from posts.thumbnails import warm_thumbnails
+
+
+def init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def warm_image(name):
+    """Задача процесса пула: (имя, число созданных миниатюр, ошибка)."""
+    try:
+        return name, warm_thumbnails(name), None
+    except Exception as error:
+        return name, 0, f'{type(error).__name__}: {error}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры всех картинок постов во всех размерах из '
+        'POST_THUMBNAILS пулом процессов, пропуская уже созданные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Число процессов, 0 - без пула (по умолчанию - число CPU)',
+        )
+        parser.add_argument(
+            '--progress',
+            type=int,
+            default=100,
+            help='Выводить прогресс каждые N картинок',
+        )
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct())
+        started = time.perf_counter()
+        done = created = 0
+        warmed = []
+        errors = []
+        for name, count, error in self.warm(names, options['workers']):
+            done += 1
+            created += count
+            if count:
+                warmed.append(name)
+            if error:
+                errors.append(name)
+                self.stderr.write(f'{name}: {error}')
+            if done % options['progress'] == 0 or done == len(names):
+                rate = done / (time.perf_counter() - started)
+                self.stdout.write(
+                    f'{done}/{len(names)} картинок, создано миниатюр: '
+                    f'{created}, {rate:.1f} картинок/с'
+                )
+        # Страницы с заглушками могли попасть в кэш фрагментов
+        bump_image_feed_versions(warmed)
+        message = (
+            f'Картинок: {len(names)}, создано миниатюр: {created}, '
+            f'ошибок: {len(errors)}'
+        )
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(message))
+
+    def warm(self, names, workers):
+        if workers == 0:
+            yield from map(warm_image, names)
+            return
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker
+        ) as executor:
+            yield from executor.map(warm_image, names, chunksize=8)
@@ -0,0 +1,127 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date
+
+from .feeds import feed_version_key
+from .settings import PAGE_CACHE_TIMEOUT, PAGE_CACHE_VIEWS
+
+# Персональный фрагмент страницы ({% hole %}) между маркерами
+HOLE_TEMPLATE = '<!--hole:{name}-->{html}<!--/hole-->'
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w./-]+)-->.*?<!--/hole-->', re.S)
+
+
+def wrap_hole(name, html):
+    """Помечает фрагмент, отрисованный шаблоном name, маркерами."""
+    return HOLE_TEMPLATE.format(name=name, html=html)
+
+
+def punch_holes(content, request):
+    """Заново отрисовывает персональные фрагменты страницы для запроса."""
+    return HOLE_RE.sub(
+        lambda match: wrap_hole(
+            match['name'], render_to_string(match['name'], request=request)
+        ),
+        content
+    )
+
+
+def page_cache_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Кэширует целиком страницы из PAGE_CACHE_VIEWS, отрисованные для
+    анонимных читателей, по пути и параметрам запроса. Страница годна,
+    пока не сменились версии лент, с которыми она отрисована
+    (request.feed_versions). Вошедшим пользователям кэшированные страницы
+    отдаются только там, где это разрешено, с заново отрисованными
+    персональными фрагментами {% hole %}.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        shared = self.page_sharing(request)
+        if shared is None:
+            return self.get_response(request)
+        anonymous = not request.user.is_authenticated
+        if not anonymous and not shared:
+            return self.get_response(request)
+        key = page_cache_key(request)
+        page = cache.get(key)
+        if page is not None and self.is_fresh(page):
+            return self.cached_response(request, page, anonymous)
+        response = self.get_response(request)
+        if anonymous and self.can_store(request, response):
+            cache.set(key, {
+                'versions': request.feed_versions,
+                'content': response.content.decode(response.charset),
+                'content_type': response['Content-Type'],
+                'etag': response['ETag'],
+                'last_modified': parse_http_date(response['Last-Modified']),
+            }, PAGE_CACHE_TIMEOUT)
+        return response
+
+    def page_sharing(self, request):
+        """
+        None, если страница не кэшируется, иначе признак того, что ее
+        можно отдавать и вошедшим пользователям.
+        """
+        if (
+            not settings.PAGE_CACHE_ENABLED
+            or request.method not in ('GET', 'HEAD')
+            or 'messages' in request.COOKIES
+        ):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        # Нужен шаблонам персональных фрагментов при отдаче из кэша
+        request.resolver_match = match
+        return PAGE_CACHE_VIEWS.get(match.view_name)
+
+    def is_fresh(self, page):
+        """Не сменились ли версии лент, с которыми отрисована страница."""
+        keys = {
+            feed_version_key(scope): version
+            for scope, version in page['versions'].items()
+        }
+        return cache.get_many(keys) == keys
+
+    def can_store(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'ETag' in response
+            and hasattr(request, 'feed_versions')
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
+
+    def cached_response(self, request, page, anonymous):
+        if not anonymous:
+            return HttpResponse(
+                punch_holes(page['content'], request),
+                content_type=page['content_type']
+            )
+        response = get_conditional_response(
+            request, etag=page['etag'], last_modified=page['last_modified']
+        )
+        if response is None:
+            response = HttpResponse(
+                page['content'], content_type=page['content_type']
+            )
+            response['ETag'] = page['etag']
+            response['Last-Modified'] = http_date(page['last_modified'])
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+from posts.excerpts import set_excerpt
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text').order_by('id')
+    batch = []
+    for post in posts.iterator(chunk_size=2000):
+        set_excerpt(post)
+        batch.append(post)
+        if len(batch) >= 2000:
+            Post.objects.bulk_update(batch, ['excerpt', 'is_truncated'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt', 'is_truncated'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало текста (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Текст сокращен'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
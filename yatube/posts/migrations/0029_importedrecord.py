@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_timeline_user_created_post_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Источник')),
+                ('record_type', models.CharField(max_length=16, verbose_name='Тип записи')),
+                ('source_id', models.BigIntegerField(verbose_name='Id в источнике')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id в БД')),
+            ],
+            options={
+                'verbose_name': 'Импортированная запись',
+                'verbose_name_plural': 'Импортированные записи',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedrecord',
+            constraint=models.UniqueConstraint(fields=('source', 'record_type', 'source_id'), name='unique_imported_record'),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.db import models
 
 from core.models import CreatedModel
 
+from .excerpts import set_excerpt
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -25,11 +28,30 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Заполняет начало текста постов: при массовой вставке сигналы
+        модели не вызываются.
+        """
+        objs = list(objs)
+        for post in objs:
+            set_excerpt(post)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
     )
+    # Заполняются при сохранении, чтобы ленты не читали полный текст
+    excerpt = models.TextField(
+        'Начало текста (HTML)', blank=True, editable=False
+    )
+    is_truncated = models.BooleanField(
+        'Текст сокращен', default=False, editable=False
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -47,15 +69,46 @@ class Post(CreatedModel):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        db_index=True,
         verbose_name='Картинка',
         help_text='Загрузите изображение',
         blank=True,
     )
+    # Заполняются при загрузке картинки, чтобы не открывать файл
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер файла картинки', null=True, blank=True, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -83,6 +136,12 @@ class Comment(CreatedModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -112,6 +171,102 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} follows {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись материализованной ленты подписок: пост автора, на которого
+    подписан пользователь. Дата создания поста продублирована для индекса.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.post} in {self.user} timeline'
+
+
+class UserStats(models.Model):
+    """
+    Денормализованные счетчики пользователя. Поддерживаются при записи
+    постов, комментариев и подписок, чтобы страницы не считали их COUNT(*).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user} stats'
+
+
+class ImportedRecord(models.Model):
+    """
+    Запись файла импорта, уже перенесенная в БД: id группы, поста или
+    комментария в источнике -> id объекта. По ней повторный импорт
+    узнает перенесенные записи.
+    """
+    source = models.CharField('Источник', max_length=255)
+    record_type = models.CharField('Тип записи', max_length=16)
+    source_id = models.BigIntegerField('Id в источнике')
+    object_id = models.PositiveIntegerField('Id в БД')
+
+    class Meta:
+        verbose_name = 'Импортированная запись'
+        verbose_name_plural = 'Импортированные записи'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'record_type', 'source_id'],
+                name='unique_imported_record'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.record_type} {self.source_id}'
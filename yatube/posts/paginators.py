@@ -0,0 +1,167 @@
+import base64
+import binascii
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_SEPARATOR = '_'
+
+
+def encode_key(value, pk):
+    """Кодирует позицию (значение сортировки, id) в непрозрачный токен."""
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_key(token, parse):
+    """
+    Декодирует токен в пару (значение сортировки, id), значение
+    разбирается функцией parse. Для битого токена возвращает None.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)
+        ).decode()
+        value, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def encode_cursor(post):
+    """Кодирует позицию поста (created, id) в непрозрачный токен."""
+    return encode_key(post.created.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    """Декодирует токен в пару (created, id) либо None."""
+    return decode_key(token, parse_datetime)
+
+
+class CountingPaginator(Paginator):
+    """
+    Постраничный пагинатор без COUNT(*) на каждый запрос: число объектов
+    передается готовым (например, из таблицы счетчиков) либо кэшируется
+    по ключу count_key.
+    """
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 count_timeout=None):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        if count is not None:
+            self.count = count
+
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.object_list.count()
+        return cache.get_or_set(
+            self.count_key, self.object_list.count, self.count_timeout
+        )
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """
+        Номера страниц для навигации: первые и последние on_ends страниц и
+        окно в on_each_side страниц вокруг текущей, пропуски - ELLIPSIS.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинатор по курсору (created, id). Не выполняет ни COUNT, ни OFFSET:
+    страница выбирается индексируемым диапазонным запросом от курсора.
+    Номер страницы и число страниц известны лишь относительно соседних
+    страниц: 1 для первой страницы, 2 для любой последующей.
+
+    Если передан keys - queryset записей с полями created и post_id
+    (например, материализованной ленты), страница выбирается из них, а
+    посты страницы загружаются из object_list по id.
+    """
+    is_cursor = True
+    # Параметры запроса, сохраняемые в ссылках навигации (с & в конце)
+    base_query = ''
+
+    def __init__(self, object_list, per_page, keys=None):
+        super().__init__(
+            object_list.order_by('-created', '-id'), per_page
+        )
+        self.keys = keys
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.num_pages = 1
+
+    def select(self, cursor, descending, limit):
+        """
+        До limit объектов после курсора cursor в порядке убывания
+        (descending) либо возрастания (created, id).
+        """
+        pk_field = 'id' if self.keys is None else 'post_id'
+        queryset = self.object_list if self.keys is None else self.keys
+        lookup = 'lt' if descending else 'gt'
+        if cursor:
+            created, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'created__{lookup}': created})
+                | Q(created=created, **{f'{pk_field}__{lookup}': pk})
+            )
+        order = ('-created', f'-{pk_field}') if descending else (
+            'created', pk_field
+        )
+        queryset = queryset.order_by(*order)
+        if self.keys is None:
+            return list(queryset[:limit])
+        post_ids = list(queryset.values_list(pk_field, flat=True)[:limit])
+        posts = self.object_list.in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after либо до курсора before."""
+        after = decode_cursor(after)
+        before = None if after else decode_cursor(before)
+        limit = self.per_page + 1
+        if before:
+            posts = self.select(before, False, limit)
+            has_previous = len(posts) > self.per_page
+            posts = posts[:self.per_page][::-1]
+            has_next = True
+        else:
+            posts = self.select(after, True, limit)
+            has_previous = after is not None
+            has_next = len(posts) > self.per_page
+            posts = posts[:self.per_page]
+        if posts and has_previous:
+            self.previous_cursor = encode_cursor(posts[0])
+        if posts and has_next:
+            self.next_cursor = encode_cursor(posts[-1])
+        number = 2 if has_previous else 1
+        self.num_pages = number + has_next
+        return self._get_page(posts, number, self)
@@ -0,0 +1,182 @@
+import re
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+
+from .feeds import feed_posts
+from .models import Post
+from .paginators import CursorPaginator, decode_key, encode_key
+from .settings import SEARCH_SNIPPET_TOKENS
+
+# Полнотекстовый индекс постов: виртуальная таблица FTS5, rowid = id поста
+SEARCH_TABLE = 'posts_post_fts'
+# Управляющие символы, которыми FTS5 отмечает совпадения во фрагменте
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+
+def search_available():
+    """Полнотекстовый индекс есть только в SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Переводит поисковую строку в запрос FTS5: каждое слово берется в
+    кавычки, поэтому операторы FTS5 во вводе не вызывают ошибок.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def index_post(post):
+    """Добавляет пост в поисковый индекс или обновляет его текст."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk]
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id):
+    """Удаляет пост из поискового индекса."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild_search_index():
+    """Пересобирает поисковый индекс по таблице постов."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+
+
+def search_filter(queryset, query):
+    """
+    Отбирает из queryset постов найденные по запросу, без ранжирования.
+    Без полнотекстового индекса ищет подстроку.
+    """
+    if not search_available():
+        return queryset.filter(text__icontains=query)
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        (match,)
+    ))
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MATCH_START, '<mark>')
+        .replace(MATCH_END, '</mark>')
+    )
+
+
+class SearchPaginator(Paginator):
+    """
+    Пагинатор результатов поиска по курсору (ранг BM25, id): страница
+    выбирается из индекса FTS5 одним запросом, без COUNT и OFFSET.
+    Посты страницы загружаются вторым запросом, у каждого в snippet
+    фрагмент текста с выделенными совпадениями.
+    """
+    is_cursor = True
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.match = match_expression(query)
+        self.base_query = urlencode({'q': query}) + '&'
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.num_pages = 1
+
+    def rank(self, cursor, descending, limit):
+        """Строки (id, ранг, фрагмент) после позиции cursor."""
+        order = 'DESC' if descending else 'ASC'
+        sql = (
+            f'SELECT rowid, bm25({SEARCH_TABLE}), '
+            f"snippet({SEARCH_TABLE}, 0, %s, %s, '…', %s) "
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+        )
+        params = [MATCH_START, MATCH_END, SEARCH_SNIPPET_TOKENS, self.match]
+        if cursor:
+            sql += (
+                f' AND (bm25({SEARCH_TABLE}), rowid) '
+                f'{"<" if descending else ">"} (%s, %s)'
+            )
+            params.extend(cursor)
+        sql += f' ORDER BY 2 {order}, 1 {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return db_cursor.fetchall()
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after либо до курсора before."""
+        after = decode_key(after, float)
+        before = None if after else decode_key(before, float)
+        limit = self.per_page + 1
+        rows = []
+        if self.match and before:
+            rows = self.rank(before, True, limit)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            if self.match:
+                rows = self.rank(after, False, limit)
+            has_previous = after is not None
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        if rows and has_previous:
+            self.previous_cursor = encode_key(repr(rows[0][1]), rows[0][0])
+        if rows and has_next:
+            self.next_cursor = encode_key(repr(rows[-1][1]), rows[-1][0])
+        posts = feed_posts(Post.objects.all()).in_bulk(
+            [post_id for post_id, _, _ in rows]
+        )
+        results = []
+        for post_id, _, snippet in rows:
+            if post_id in posts:
+                posts[post_id].snippet = highlight(snippet)
+                results.append(posts[post_id])
+        number = 2 if has_previous else 1
+        self.num_pages = number + has_next
+        return self._get_page(results, number, self)
+
+
+def search_page(query, per_page, after=None, before=None):
+    """
+    Страница результатов поиска. Без полнотекстового индекса посты с
+    подстрокой query выводятся от новых к старым.
+    """
+    if search_available():
+        return SearchPaginator(query, per_page).get_page(after, before)
+    paginator = CursorPaginator(
+        feed_posts(search_filter(Post.objects.all(), query)), per_page
+    )
+    paginator.base_query = urlencode({'q': query}) + '&'
+    return paginator.get_page(after, before)
@@ -1,2 +1,63 @@
 # Кастомные константы приложения Posts
 POSTS_ON_PAGE = 10
+# Число комментариев на странице поста и в подгружаемой порции
+COMMENTS_ON_PAGE = 20
+# Длина начала текста поста в карточках лент
+POST_EXCERPT_LENGTH = 300
+# Максимальная длина материализованной ленты подписок пользователя
+TIMELINE_LENGTH = 1000
+# Длина кэшированного списка свежих постов автора для слияния лент
+AUTHOR_TIMELINE_LENGTH = 100
+AUTHOR_TIMELINE_CACHE_TIMEOUT = 60 * 60
+# Максимальная длина ленты подписок, собранной слиянием
+MERGED_FEED_LENGTH = 500
+# Время жизни кэшированного числа постов ленты (сбрасывается сменой версии
+# ленты) и приближенного числа постов главной страницы
+FEED_COUNT_TIMEOUT = 6 * 60 * 60
+APPROXIMATE_COUNT_TIMEOUT = 10 * 60
+# Время жизни кэшированного множества авторов, на которых подписан
+# пользователь
+FOLLOW_GRAPH_CACHE_TIMEOUT = 60 * 60
+# Страницы, целиком кэшируемые для анонимных читателей: имя маршрута ->
+# можно ли отдавать кэшированную страницу вошедшим пользователям (тело
+# страницы у них такое же, отличаются только фрагменты {% hole %})
+PAGE_CACHE_VIEWS = {
+    'posts:index': True,
+    'posts:group_list': True,
+    'posts:profile': False,
+    'posts:post_detail': False,
+}
+# Предельное время жизни кэшированной страницы: версии лент не учитывают
+# правку групп и профилей пользователей
+PAGE_CACHE_TIMEOUT = 10 * 60
+# Размер порции строк, читаемых из БД при выгрузке постов
+EXPORT_CHUNK_SIZE = 2000
+# Размер порции записей, вставляемых одной транзакцией при импорте постов
+IMPORT_CHUNK_SIZE = 5000
+# Число слов во фрагменте текста поста в результатах поиска
+SEARCH_SNIPPET_TOKENS = 24
+# Миниатюры картинок постов: имя -> (геометрия, параметры sorl-thumbnail)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'card_480w': ('480x170', {
+        'crop': 'center', 'upscale': True, 'format': 'WEBP'
+    }),
+    'card_960w': ('960x339', {
+        'crop': 'center', 'upscale': True, 'format': 'WEBP'
+    }),
+    'card_1440w': ('1440x509', {
+        'crop': 'center', 'upscale': True, 'format': 'WEBP'
+    }),
+}
+# Варианты WebP разной ширины для srcset миниатюры
+POST_THUMBNAIL_SRCSET = {
+    'card': ('card_480w', 'card_960w', 'card_1440w'),
+}
+# Загружаемые картинки: предельный размер файла, наибольшая сторона
+# сохраняемого оригинала и качество перекодирования в WebP
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_SIDE = 2048
+IMAGE_QUALITY = 82
+# Время после сохранения файла картинки, в течение которого он не
+# удаляется, даже если на него не ссылается ни один пост
+IMAGE_RELEASE_GRACE = 60
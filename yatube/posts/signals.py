@@ -0,0 +1,181 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .excerpts import set_excerpt
+from .feeds import (
+    backfill_timeline,
+    bump_feed_versions,
+    bump_versions,
+    drop_author_timeline,
+    drop_followed_author_ids,
+    fan_out,
+    push_to_author_timeline,
+    remove_from_timeline,
+    uses_timeline,
+)
+from .images import prepare_image, release_image
+from .models import Comment, Follow, Post, User, UserStats
+from .search import index_post, unindex_post
+from .stats import change_user_stats
+from .thumbnails import schedule_thumbnails
+
+# Посты, удаляемые в текущем потоке: их комментарии, удаляемые каскадом,
+# учтены в счетчиках и кэше лент вместе с постом
+_deleting = threading.local()
+
+
+def deleting_post_ids():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(post_init, sender=Post)
+def post_initialized(sender, instance, **kwargs):
+    """
+    Запоминает исходную группу поста для сброса кэша ее ленты и исходную
+    картинку для освобождения ее файла.
+    """
+    instance._initial_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    # Строка - имя уже сохраненного файла, а не новая загрузка
+    instance._initial_image = image if isinstance(image, str) else None
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    """
+    Заполняет начало текста поста для лент. Уменьшает и перекодирует
+    новую картинку поста, запоминает ее размеры, формат и размер файла.
+    """
+    if 'text' in instance.__dict__:
+        set_excerpt(instance)
+    if raw or 'image' not in instance.__dict__:
+        return
+    prepare_image(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Сбрасывает кэш лент поста, обновляет поисковый индекс, ставит в
+    очередь создание миниатюр картинки, учитывает новый пост в счетчиках
+    автора и лентах подписчиков.
+    """
+    if raw:
+        return
+    bump_feed_versions(instance)
+    index_post(instance)
+    if 'image' in instance.__dict__:
+        initial_image = instance._initial_image
+        instance._initial_image = instance.image.name
+        if initial_image and initial_image != instance.image.name:
+            transaction.on_commit(partial(release_image, initial_image))
+        if instance.image:
+            transaction.on_commit(partial(schedule_thumbnails, instance))
+    instance._initial_group_id = instance.group_id
+    if created:
+        change_user_stats(instance.author_id, posts_count=1)
+        push_to_author_timeline(instance)
+        if uses_timeline():
+            fan_out(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """
+    Учитывает комментарии удаляемого поста в счетчиках их авторов: один
+    запрос на автора вместо запроса на каждый комментарий.
+    """
+    deleting_post_ids().add(instance.pk)
+    comment_counts = (
+        Comment.objects.filter(post_id=instance.pk)
+        .order_by()
+        .values_list('author_id')
+        .annotate(total=Count('id'))
+    )
+    for author_id, total in comment_counts:
+        change_user_stats(author_id, comments_count=-total)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """
+    Учитывает удаление поста в кэше лент, поисковом индексе и счетчиках
+    автора, освобождает файл картинки.
+    """
+    deleting_post_ids().discard(instance.pk)
+    bump_feed_versions(instance)
+    unindex_post(instance.pk)
+    if instance.__dict__.get('image'):
+        transaction.on_commit(partial(release_image, instance.image.name))
+    change_user_stats(instance.author_id, posts_count=-1)
+    drop_author_timeline(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Сбрасывает кэш и версию подписок, учитывает подписку в счетчиках и
+    заполняет ленту подписок постами нового избранного автора.
+    """
+    if not created or raw:
+        return
+    drop_followed_author_ids(instance.user_id)
+    bump_versions(f'follows:{instance.user_id}')
+    change_user_stats(instance.author_id, followers_count=1)
+    change_user_stats(instance.user_id, following_count=1)
+    if uses_timeline():
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш и версию подписок, учитывает отписку в счетчиках и
+    убирает из ленты подписок посты автора.
+    """
+    drop_followed_author_ids(instance.user_id)
+    bump_versions(f'follows:{instance.user_id}')
+    change_user_stats(instance.author_id, followers_count=-1)
+    change_user_stats(instance.user_id, following_count=-1)
+    if uses_timeline():
+        remove_from_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    """Учитывает новый комментарий в кэше лент и счетчиках автора."""
+    if created and not raw:
+        bump_feed_versions(instance.post)
+        change_user_stats(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """
+    Учитывает удаление комментария в кэше лент и счетчиках автора.
+    Комментарии удаляемого поста учтены при удалении поста.
+    """
+    if instance.post_id in deleting_post_ids():
+        return
+    bump_feed_versions(instance.post)
+    change_user_stats(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Заводит счетчики новому пользователю."""
+    if created and not raw:
+        UserStats.objects.create(user=instance)
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+STATS_FIELDS = (
+    'posts_count',
+    'comments_count',
+    'followers_count',
+    'following_count',
+)
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно изменяет счетчики пользователя на заданные величины."""
+    UserStats.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def get_user_stats(user):
+    """
+    Счетчики пользователя. Пользователю без строки счетчиков (например,
+    загруженному loaddata) подставляются нулевые несохраненные счетчики,
+    они же кэшируются в user.stats.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def count_user_stats():
+    """Считает счетчики всех пользователей по исходным таблицам."""
+    stats = defaultdict(lambda: dict.fromkeys(STATS_FIELDS, 0))
+    for queryset, user_field, field in (
+        (Post.objects, 'author_id', 'posts_count'),
+        (Comment.objects, 'author_id', 'comments_count'),
+        (Follow.objects, 'author_id', 'followers_count'),
+        (Follow.objects, 'user_id', 'following_count'),
+    ):
+        rows = queryset.order_by().values(user_field).annotate(
+            total=Count('id')
+        ).values_list(user_field, 'total')
+        for user_id, total in rows:
+            stats[user_id][field] = total
+    return stats
+
+
+def find_inconsistent_stats():
+    """
+    Возвращает пары (сохраненные, фактические) счетчики для пользователей,
+    у которых они расходятся или отсутствуют.
+    """
+    actual = count_user_stats()
+    stored = {
+        row.pop('user_id'): row
+        for row in UserStats.objects.values('user_id', *STATS_FIELDS)
+    }
+    return {
+        user_id: (stored.get(user_id), actual[user_id])
+        for user_id in User.objects.values_list('id', flat=True)
+        if stored.get(user_id) != actual[user_id]
+    }
+
+
+@transaction.atomic
+def rebuild_user_stats():
+    """
+    Пересчитывает счетчики всех пользователей одной транзакцией, чтобы
+    страницы не видели пользователей без счетчиков.
+    """
+    actual = count_user_stats()
+    UserStats.objects.all().delete()
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id, **actual[user_id])
+        for user_id in User.objects.values_list('id', flat=True)
+    )
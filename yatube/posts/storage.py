@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Глубина и ширина шардирования: posts/ab/cd/abcd....webp
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{64}$')
+# Файл блокировки, которой сохранение и удаление файлов хранилища
+# исключают друг друга во всех процессах
+LOCK_NAME = '.lock'
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, читаемого порциями."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """Имя файла по хэшу содержимого в каталоге name с шардированием."""
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    shards = [
+        digest[start:start + SHARD_WIDTH]
+        for start in range(0, SHARD_DEPTH * SHARD_WIDTH, SHARD_WIDTH)
+    ]
+    return '/'.join(
+        part for part in (directory, *shards, digest + extension) if part
+    )
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.match(
+        os.path.splitext(os.path.basename(name))[0]
+    ))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, которое называет файлы по SHA-256 содержимого и
+    раскладывает их по вложенным каталогам. Одинаковые файлы хранятся
+    один раз: повторная загрузка возвращает имя уже сохраненного файла.
+    Файл удаляется, только когда на него не ссылается ни один пост
+    (см. posts.images.release_image).
+
+    Пост, получивший имя уже сохраненного файла, ссылается на него лишь
+    после своей транзакции, и освобождение файла в этот момент потеряло
+    бы картинку. Поэтому повторное сохранение обновляет время изменения
+    файла под блокировкой хранилища, а недавно сохраненные файлы не
+    удаляются (см. saved_within).
+    """
+
+    @contextmanager
+    def lock(self):
+        """Блокировка хранилища, общая для потоков и процессов."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(self.path(LOCK_NAME), 'a') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def saved_within(self, name, seconds):
+        """Сохранялся ли файл (в том числе повторно) за последние seconds."""
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < seconds
+        except FileNotFoundError:
+            return False
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = hashed_name(name, content_hash(content))
+        with self.lock():
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+            return super().save(name, content, max_length=max_length)
@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.middleware import wrap_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """
+    Включает шаблон template_name как персональный фрагмент страницы:
+    при отдаче кэшированной страницы вошедшему пользователю фрагмент
+    отрисовывается заново.
+    """
+    html = context.template.engine.get_template(template_name).render(
+        context
+    )
+    return mark_safe(wrap_hole(template_name, html))
@@ -0,0 +1,24 @@
+import logging
+
+from django import template
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, name='card'):
+    """
+    Миниатюра картинки поста. Как и тег thumbnail из sorl-thumbnail,
+    при ошибке не ломает страницу, если не включен THUMBNAIL_DEBUG.
+    """
+    try:
+        return thumbnails.post_thumbnail(image, name)
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось получить миниатюру %s', image)
+        return None
@@ -0,0 +1,61 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def count_queries(self, posts):
+        Post.objects.bulk_create(
+            Post(author=self.admin, text='Тестовый пост', group=self.group)
+            for _ in range(posts)
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Тест числа запросов списка постов"""
+        self.count_queries(5)
+        self.assertEqual(self.count_queries(2), self.count_queries(30))
+
+    def test_changelist_search(self):
+        """Тест поиска постов в админке"""
+        Post.objects.create(author=self.admin, text='Редкое слово')
+        Post.objects.create(author=self.admin, text='Другой пост')
+        response = self.client.get(self.url, {'q': 'редкое'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Редкое слово']
+        )
+
+    def test_post_form_uses_autocomplete(self):
+        """Тест выбора автора и группы через autocomplete"""
+        response = self.client.get(reverse('admin:posts_post_add'))
+        form = response.context['adminform'].form
+        for field in ('author', 'group'):
+            with self.subTest(field=field):
+                self.assertIn(
+                    'admin-autocomplete',
+                    form.fields[field].widget.render(field, None)
+                )
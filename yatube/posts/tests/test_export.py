@@ -0,0 +1,246 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.imports import Importer
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+def parse_lines(content):
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.another_user = User.objects.create_user(username='another')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.another_post = Post.objects.create(
+            author=cls.another_user,
+            text='Другой пост',
+        )
+        cls.comment = Comment.objects.create(
+            text='Тестовый комментарий',
+            author=cls.another_user,
+            post=cls.post,
+        )
+        cls.url = reverse('posts:export_posts')
+
+    def test_export_requires_staff(self):
+        """Тест недоступности выгрузки не-сотрудникам"""
+        client = Client()
+        client.force_login(self.user)
+        for test_client in (Client(), client):
+            with self.subTest(client=test_client):
+                response = test_client.get(self.url)
+                self.assertEqual(response.status_code, 302)
+
+    def test_export_streams_filtered_lines(self):
+        """Тест потоковой выгрузки с фильтром по автору"""
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(self.url, {'author': self.user.username})
+        self.assertTrue(response.streaming)
+        records = parse_lines(b''.join(response.streaming_content).decode())
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [
+                ('group', self.group.id),
+                ('post', self.post.id),
+                ('comment', self.comment.id),
+            ]
+        )
+        self.assertEqual(records[1]['author__username'], self.user.username)
+
+    def test_export_rejects_invalid_date(self):
+        """Тест ответа 400 на некорректную дату"""
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(self.url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        """Тест выгрузки командой export_posts"""
+        out = StringIO()
+        call_command('export_posts', '--since', '2000-01-01', stdout=out)
+        records = parse_lines(out.getvalue())
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['group', 'post', 'post', 'comment']
+        )
+        with self.assertRaises(CommandError):
+            call_command('export_posts', '--until', 'завтра', stdout=out)
+
+
+class ImportTest(TestCase):
+    RECORDS = [
+        {'type': 'group', 'id': 7, 'title': 'Группа', 'slug': 'imported',
+         'description': 'Описание'},
+        {'type': 'post', 'id': 70, 'created': '2020-01-01T10:00:00+00:00',
+         'text': 'Старый пост', 'author__username': 'writer',
+         'group_id': 7, 'image': ''},
+        {'type': 'post', 'id': 71, 'created': '2020-01-02T10:00:00+00:00',
+         'text': 'Еще пост', 'author__username': 'writer',
+         'group_id': None, 'image': ''},
+        {'type': 'comment', 'id': 700, 'created': '2020-01-03T10:00:00+00:00',
+         'text': 'Комментарий', 'author__username': 'reader', 'post_id': 70},
+        {'type': 'follow', 'user__username': 'reader',
+         'author__username': 'writer'},
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'posts.jsonl')
+        self.checkpoint = os.path.join(directory.name, 'checkpoint')
+        with open(self.path, 'w', encoding='utf-8') as target:
+            for record in self.RECORDS:
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def import_posts(self, *args):
+        out = StringIO()
+        call_command(
+            'import_posts', self.path, '--chunk-size', '2', *args,
+            stdout=out, stderr=out
+        )
+        return out.getvalue()
+
+    def assert_imported(self):
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.author.username, 'writer')
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(post.created.year, 2020)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertEqual(
+            [Group.objects.count(), Post.objects.count(),
+             Comment.objects.count(), Follow.objects.count()],
+            [1, 2, 1, 1]
+        )
+        self.assertEqual(
+            UserStats.objects.get(user__username='writer').posts_count, 2
+        )
+
+    def test_import_is_idempotent(self):
+        """Тест повторного импорта без дублирования записей"""
+        self.assertIn('Импортировано записей: 5', self.import_posts())
+        self.assertIn('уже было: 5', self.import_posts())
+        self.assert_imported()
+
+    def test_import_remaps_colliding_ids(self):
+        """
+        Тест импорта групп и постов, id которых заняты в БД: группы
+        сопоставляются по slug, комментарии - с новыми id постов.
+        """
+        user = User.objects.create_user(username='local')
+        Group.objects.create(
+            id=7, title='Собаки', slug='dogs', description='Собаки'
+        )
+        local_post = Post.objects.create(id=70, author=user, text='Местный')
+        Group.objects.create(
+            id=8, title='Уже есть', slug='imported', description='Есть'
+        )
+        self.import_posts()
+        post = Post.objects.get(text='Старый пост')
+        self.assertNotEqual(post.id, local_post.id)
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(post.comments.get().text, 'Комментарий')
+        self.assertFalse(local_post.comments.exists())
+        self.assertEqual(Group.objects.get(id=7).slug, 'dogs')
+
+    def append_records(self, *records):
+        with open(self.path, 'a', encoding='utf-8') as target:
+            for record in records:
+                target.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def test_import_keeps_posts_with_same_moment(self):
+        """
+        Тест импорта постов и комментариев одного автора с одинаковой
+        датой создания: записи различаются по id в источнике.
+        """
+        moment = '2020-01-05T10:00:00+00:00'
+        self.append_records(*(
+            {'type': 'post', 'id': post_id, 'created': moment,
+             'text': f'Пост {post_id}', 'author__username': 'writer',
+             'group_id': None, 'image': ''}
+            for post_id in (72, 73)
+        ), *(
+            {'type': 'comment', 'id': comment_id, 'created': moment,
+             'text': 'Одновременный', 'author__username': 'reader',
+             'post_id': 72}
+            for comment_id in (720, 721)
+        ))
+        self.assertIn('Импортировано записей: 9', self.import_posts())
+        self.assertIn('уже было: 9', self.import_posts())
+        self.assertEqual(
+            Post.objects.filter(created__day=5).count(), 2
+        )
+        self.assertEqual(
+            Post.objects.get(text='Пост 72').comments.count(), 2
+        )
+        self.assertEqual(
+            UserStats.objects.get(user__username='writer').posts_count, 4
+        )
+
+    def test_import_reports_repeated_ids(self):
+        """Тест конфликта на повторе записи с тем же id в источнике"""
+        self.append_records({
+            'type': 'post', 'id': 71, 'created': '2020-01-06T10:00:00+00:00',
+            'text': 'Повтор', 'author__username': 'writer',
+            'group_id': None, 'image': '',
+        })
+        output = self.import_posts('--chunk-size', '10')
+        self.assertIn('Конфликт в записи 6: повтор записи с id 71', output)
+        self.assertFalse(Post.objects.filter(text='Повтор').exists())
+
+    def test_import_reports_conflicts(self):
+        """Тест пропуска записей со ссылками на неизвестные посты"""
+        with open(self.path, 'a', encoding='utf-8') as target:
+            target.write(json.dumps({
+                'type': 'comment', 'id': 701,
+                'created': '2020-01-04T10:00:00+00:00', 'text': 'Потерян',
+                'author__username': 'reader', 'post_id': 99,
+            }, ensure_ascii=False) + '\n')
+        output = self.import_posts()
+        self.assertIn('Конфликт в записи 6', output)
+        self.assertIn('Импортировано записей: 5', output)
+        self.assertIn('конфликтов: 1', output)
+        self.assertFalse(Comment.objects.filter(text='Потерян').exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Тест продолжения импорта с сохраненной порции"""
+        Importer('posts.jsonl').import_chunk(self.RECORDS[:2])
+        Group.objects.filter(slug='imported').update(
+            title='Импортирована ранее'
+        )
+        with open(self.checkpoint, 'w') as target:
+            target.write('2')
+        self.import_posts('--checkpoint', self.checkpoint)
+        self.assert_imported()
+        self.assertEqual(
+            Group.objects.get(slug='imported').title, 'Импортирована ранее'
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_import_rejects_unknown_records(self):
+        """Тест ошибки на записи неизвестного типа"""
+        with open(self.path, 'a', encoding='utf-8') as target:
+            target.write('{"type": "like", "author__username": "writer"}\n')
+        with self.assertRaises(CommandError):
+            self.import_posts()
@@ -1,6 +1,9 @@
+import shutil
+import tempfile
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django import forms
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Comment, Post, Group, User
@@ -10,8 +13,10 @@ SLUG_1 = 'TestGroupSlug1'
 NICK = 'AutoTestUser'
 POST_CREATE_URL = reverse('posts:post_create')
 PROFILE_URL = reverse('posts:profile', args=[NICK])
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTest(TestCase):
 
     @classmethod
@@ -56,6 +61,11 @@ class PostCreateFormTest(TestCase):
             'posts:add_comment', args=[cls.ref_post.id]
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.author = Client()
         self.author.force_login(self.user)
@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -94,3 +99,112 @@ class PostModelTest(TestCase):
                         model._meta.get_field(field).verbose_name,
                         expected_value
                     )
+
+    def test_post_excerpt(self):
+        """
+        Тест начала текста поста: заполняется при сохранении и массовой
+        вставке, экранирует HTML и сокращает длинный текст.
+        """
+        long_text = '<b>Длинный</b> пост\n' + 'слово ' * 100
+        post = Post.objects.create(author=self.user, text=long_text)
+        self.assertTrue(post.is_truncated)
+        self.assertTrue(post.excerpt.startswith(
+            '<p>&lt;b&gt;Длинный&lt;/b&gt; пост<br>'
+        ))
+        self.assertTrue(post.excerpt.endswith('…</p>'))
+        post.text = 'Короткий\n\nпост'
+        post.save()
+        post.refresh_from_db()
+        self.assertFalse(post.is_truncated)
+        self.assertEqual(post.excerpt, '<p>Короткий</p>\n\n<p>пост</p>')
+        Post.objects.bulk_create([Post(author=self.user, text=long_text)])
+        self.assertTrue(Post.objects.get(
+            text=long_text, pk__gt=post.pk
+        ).is_truncated)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.another_user = User.objects.create_user(username='another')
+
+    def get_stats(self, user):
+        return UserStats.objects.values(
+            'posts_count',
+            'comments_count',
+            'followers_count',
+            'following_count'
+        ).get(user=user)
+
+    def test_stats_follow_writes(self):
+        """
+        Тест поддержки счетчиков при записи постов, комментариев и подписок.
+        """
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(
+            text='Тестовый комментарий',
+            author=self.another_user,
+            post=post
+        )
+        follow = Follow.objects.create(
+            user=self.another_user,
+            author=self.user
+        )
+        self.assertEqual(self.get_stats(self.user), {
+            'posts_count': 1,
+            'comments_count': 0,
+            'followers_count': 1,
+            'following_count': 0,
+        })
+        self.assertEqual(self.get_stats(self.another_user), {
+            'posts_count': 0,
+            'comments_count': 1,
+            'followers_count': 0,
+            'following_count': 1,
+        })
+        follow.delete()
+        post.delete()
+        for user in (self.user, self.another_user):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    set(self.get_stats(user).values()), {0}
+                )
+
+    def test_post_delete_with_comments(self):
+        """
+        Тест учета комментариев удаляемого поста в счетчиках числом
+        запросов, не зависящим от числа комментариев.
+        """
+        queries = []
+        for comments_total in (2, 50):
+            post = Post.objects.create(author=self.user, text='Пост')
+            for number in range(comments_total):
+                Comment.objects.create(
+                    text='Комментарий',
+                    author=(self.user, self.another_user)[number % 2],
+                    post=post
+                )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+            for user in (self.user, self.another_user):
+                with self.subTest(user=user, comments_total=comments_total):
+                    self.assertEqual(
+                        self.get_stats(user)['comments_count'], 0
+                    )
+        self.assertEqual(queries[0], queries[1])
+
+    def test_rebuild_user_stats(self):
+        """Тест проверки и пересчета счетчиков командой."""
+        call_command('rebuild_user_stats', check=True, stdout=StringIO())
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Тестовый пост {post_num}')
+            for post_num in range(3)
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_user_stats', check=True, stdout=StringIO())
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.get_stats(self.user)['posts_count'], 3)
+        call_command('rebuild_user_stats', check=True, stdout=StringIO())
@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+INDEX_URL = reverse('posts:index')
+LOGIN_URL = reverse('users:login')
+LOGOUT_URL = reverse('users:logout')
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.GROUP_URL = reverse('posts:group_list', args=[cls.group.slug])
+        cls.PROFILE_URL = reverse('posts:profile', args=[cls.user.username])
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.id]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader = Client()
+        self.reader.force_login(self.user)
+
+    def test_anonymous_pages_cached(self):
+        """
+        Тест отдачи страниц анонимному читателю из кэша без запросов к БД
+        и сброса кэша при записи.
+        """
+        for url in (
+            INDEX_URL, f'{INDEX_URL}?page=1', self.GROUP_URL,
+            self.PROFILE_URL, self.POST_DETAIL_URL,
+        ):
+            with self.subTest(url=url):
+                content = self.guest.get(url).content
+                with self.assertNumQueries(0):
+                    response = self.guest.get(url)
+                self.assertEqual(response.content, content)
+                self.assertIsNone(response.context)
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        for url in (INDEX_URL, self.GROUP_URL, self.PROFILE_URL):
+            with self.subTest(url=url):
+                self.assertContains(self.guest.get(url), 'Новый пост')
+
+    def test_conditional_get_from_cache(self):
+        """Тест ответа 304 по ETag страницы из кэша."""
+        etag = self.guest.get(INDEX_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_holes_punched_for_logged_in_user(self):
+        """
+        Тест отдачи кэшированной страницы вошедшему пользователю с его
+        собственной навигацией в шапке.
+        """
+        self.assertContains(self.guest.get(INDEX_URL), LOGIN_URL)
+        # Сессия и пользователь
+        with self.assertNumQueries(2):
+            response = self.reader.get(INDEX_URL)
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        self.assertTemplateUsed(response, 'includes/header.html')
+        self.assertContains(response, 'Тестовый пост')
+        self.assertContains(response, LOGOUT_URL)
+        self.assertContains(response, reverse('posts:follow_index'))
+        self.assertNotContains(response, LOGIN_URL)
+
+    def test_personal_pages_not_shared(self):
+        """
+        Тест страниц с персональным содержимым: вошедшему пользователю
+        они не отдаются из кэша, а его страницы не кэшируются.
+        """
+        for url in (self.PROFILE_URL, self.POST_DETAIL_URL):
+            with self.subTest(url=url):
+                self.guest.get(url)
+                self.assertIsNotNone(self.reader.get(url).context)
+        self.reader.get(self.GROUP_URL)
+        self.assertIsNotNone(self.guest.get(self.GROUP_URL).context)
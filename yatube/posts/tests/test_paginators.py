@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from posts.models import Post
+from posts.paginators import CountingPaginator
+
+ELLIPSIS = CountingPaginator.ELLIPSIS
+
+
+class CountingPaginatorTest(TestCase):
+
+    def test_elided_page_range(self):
+        """Тест окна номеров страниц для навигации"""
+        CASES = [
+            (5, 1, [1, 2, 3, 4, 5]),
+            (100, 1, [1, 2, 3, ELLIPSIS, 100]),
+            (100, 5, [1, 2, 3, 4, 5, 6, 7, ELLIPSIS, 100]),
+            (100, 50, [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100]),
+            (100, 100, [1, ELLIPSIS, 98, 99, 100]),
+        ]
+        for num_pages, number, page_range in CASES:
+            paginator = CountingPaginator(
+                Post.objects.all(), 10, count=num_pages * 10
+            )
+            with self.subTest(num_pages=num_pages, number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)),
+                    page_range
+                )
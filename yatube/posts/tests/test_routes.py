@@ -14,7 +14,19 @@ CASES = [
     ('add_comment', [POST_ID], f'/posts/{POST_ID}/comment/'),
     ('profile_follow', [USER], f'/profile/{USER}/follow/'),
     ('profile_unfollow', [USER], f'/profile/{USER}/unfollow/'),
-    ('follow_index', None, '/follow/')
+    (
+        'subscription_follow',
+        [USER],
+        f'/profile/{USER}/subscription/follow/'
+    ),
+    (
+        'subscription_unfollow',
+        [USER],
+        f'/profile/{USER}/subscription/unfollow/'
+    ),
+    ('follow_index', None, '/follow/'),
+    ('search', None, '/search/'),
+    ('export_posts', None, '/export/'),
 ]
 
 
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import search_filter
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.best = Post.objects.create(
+            author=cls.user, text='Кот <b>и</b> кот, снова кот'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Собака и кот гуляли долго-долго'
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.user, text='Про погоду'
+        )
+        cls.url = reverse('posts:search')
+
+    def search(self, query, **params):
+        response = Client().get(self.url, {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_search_ranks_and_highlights(self):
+        """Тест ранжирования BM25 и выделения совпадений"""
+        response, posts = self.search('КОТ')
+        self.assertEqual(posts, [self.best, self.other])
+        self.assertIn(
+            '<mark>Кот</mark> &lt;b&gt;и&lt;/b&gt;', posts[0].snippet
+        )
+        self.assertContains(response, '<mark>кот</mark>')
+
+    def test_search_tolerates_operators(self):
+        """Тест запроса со служебными символами FTS5"""
+        for query in ('"кот', 'кот AND', '*', 'NEAR(кот'):
+            with self.subTest(query=query):
+                response = Client().get(self.url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_search_index_follows_posts(self):
+        """Тест обновления индекса при правке и удалении поста"""
+        self.unrelated.text = 'Теперь про кота и кот'
+        self.unrelated.save()
+        self.assertIn(self.unrelated, self.search('кот')[1])
+        self.unrelated.delete()
+        self.assertEqual(self.search('кот')[1], [self.best, self.other])
+        self.assertEqual(self.search('погоду')[1], [])
+
+    def test_search_cursor_pagination(self):
+        """Тест перехода по страницам результатов по курсору"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Заметка номер {num}')
+            for num in range(25)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        seen = []
+        response, posts = self.search('заметка')
+        while True:
+            seen.extend(posts)
+            cursor = response.context['page_obj'].paginator.next_cursor
+            if not cursor:
+                break
+            response, posts = self.search('заметка', after=cursor)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        previous = response.context['page_obj'].paginator.previous_cursor
+        _, posts = self.search('заметка', before=previous)
+        self.assertEqual(posts, seen[10:20])
+
+    def test_search_filter(self):
+        """Тест отбора постов для поиска в админке"""
+        self.assertQuerysetEqual(
+            search_filter(Post.objects.order_by('id'), 'собака'),
+            [self.other], transform=lambda post: post
+        )
+        self.assertFalse(search_filter(Post.objects.all(), '!!!').exists())
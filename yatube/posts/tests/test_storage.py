@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from posts.models import Post, User
+from posts.storage import is_hashed_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.storage = Post._meta.get_field('image').storage
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, SMALL_GIF),
+        )
+
+    @mock.patch('posts.images.IMAGE_RELEASE_GRACE', 0)
+    def test_identical_uploads_share_file(self):
+        """Тест хранения одинаковых картинок одним файлом"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed_name(first.image.name))
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+        )
+        first.delete()
+        self.assertTrue(self.storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(self.storage.exists(second.image.name))
+
+    def test_recently_saved_image_is_kept(self):
+        """
+        Тест сохранения файла, повторно загруженного во время удаления
+        ссылавшегося на него поста
+        """
+        post = self.create_post()
+        name = post.image.name
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        # Одинаковая картинка загружается, а пост с ней еще не сохранен
+        with open(path, 'rb') as source:
+            self.storage.save('posts/again.webp', SimpleUploadedFile(
+                'again.webp', source.read()
+            ))
+        post.delete()
+        self.assertTrue(self.storage.exists(name))
+        os.utime(path, (0, 0))
+        Post.objects.create(author=self.user, text='Еще', image=name).delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_sweep_images_command(self):
+        """
+        Тест удаления файлов без ссылок, оставленных из-за недавнего
+        сохранения
+        """
+        post = self.create_post()
+        kept = post.image.name
+        orphan = self.storage.save('posts/orphan.gif', SimpleUploadedFile(
+            'orphan.gif', SMALL_GIF + b'\x00'
+        ))
+        recent = self.storage.save('posts/recent.gif', SimpleUploadedFile(
+            'recent.gif', SMALL_GIF + b'\x00\x00'
+        ))
+        for name in (kept, orphan):
+            os.utime(self.storage.path(name), (0, 0))
+        out = StringIO()
+        call_command('sweep_images', stdout=out)
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertTrue(self.storage.exists(kept))
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(recent))
+
+    @mock.patch('posts.images.IMAGE_RELEASE_GRACE', 0)
+    def test_replaced_image_is_released(self):
+        """Тест удаления файла убранной из поста картинки"""
+        post = Post.objects.get(id=self.create_post().id)
+        old_name = post.image.name
+        with transaction.atomic():
+            post.image = None
+            post.save()
+        self.assertFalse(self.storage.exists(old_name))
+
+    def test_migrate_media_storage_command(self):
+        """Тест переноса картинок, сохраненных до хранилища по хэшу"""
+        for name in ('posts/old.gif', 'posts/copy.gif'):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as target:
+                target.write(SMALL_GIF)
+            Post.objects.create(author=self.user, text='Старый', image=name)
+        out = StringIO()
+        call_command('migrate_media_storage', stdout=out)
+        self.assertIn('Перенесено файлов: 2, ошибок: 0', out.getvalue())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(self.storage.exists(names.pop()))
+        self.assertFalse(self.storage.exists('posts/old.gif'))
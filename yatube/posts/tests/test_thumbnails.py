@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.feeds import bump_feed_versions
+from posts.forms import PostForm
+from posts.models import Post, User
+from posts.settings import IMAGE_MAX_SIDE, POST_THUMBNAILS
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        cls.url = reverse('posts:post_detail', args=[cls.post.id])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_exists(self):
+        """
+        Тест заглушки вместо еще не созданной миниатюры и постановки ее в
+        очередь создания
+        """
+        executor = mock.Mock()
+        with mock.patch.object(
+            thumbnails, 'get_executor', return_value=executor
+        ):
+            response = Client().get(self.url)
+        thumbnails._pending.clear()
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+        executor.submit.assert_called_once_with(
+            thumbnails._generate_in_background,
+            mock.ANY,
+            self.post.image.name
+        )
+        # Как и фоновая задача, сбрасывает страницы с заглушкой
+        thumbnails.generate_thumbnails(self.post.image.name)
+        bump_feed_versions(self.post)
+        response = Client().get(self.url)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_thumbnail_is_scheduled_once(self):
+        """Тест постановки картинки в очередь без повторов"""
+        executor = mock.Mock()
+        with mock.patch.object(
+            thumbnails, 'get_executor', return_value=executor
+        ):
+            thumbnails.schedule_thumbnails(self.post)
+            thumbnails.schedule_thumbnails(self.post)
+        thumbnails._pending.clear()
+        executor.submit.assert_called_once_with(
+            thumbnails._generate_in_background,
+            self.post,
+            self.post.image.name
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_synchronous_thumbnails(self):
+        """Тест синхронного создания миниатюр без фоновых потоков"""
+        response = Client().get(self.url)
+        self.assertContains(response, '<img class="card-img')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, '.webp 480w')
+
+    def test_image_metadata_saved(self):
+        """Тест сохранения размеров и формата картинки при загрузке"""
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height,
+             self.post.image_format, self.post.image_size),
+            (2, 1, 'WEBP', self.post.image.size)
+        )
+        post = Post.objects.get(id=self.post.id)
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_format, '')
+
+    def test_backfill_image_metadata_command(self):
+        """Тест заполнения метаданных ранее загруженных картинок"""
+        old = Post.objects.create(
+            author=self.user, text='Старый пост', image=self.post.image.name
+        )
+        Post.objects.create(
+            author=self.user, text='Потерянная картинка', image='posts/no.gif'
+        )
+        self.assertIsNone(old.image_width)
+        out, err = StringIO(), StringIO()
+        call_command('backfill_image_metadata', stdout=out, stderr=err)
+        old.refresh_from_db()
+        self.assertEqual((old.image_width, old.image_height), (2, 1))
+        self.assertIn('Обновлено постов: 1, ошибок: 1', out.getvalue())
+        self.assertIn('posts/no.gif', err.getvalue())
+
+    def test_warm_thumbnails_command(self):
+        """Тест команды создания недостающих миниатюр"""
+        Post.objects.create(
+            author=self.user, text='Потерянная картинка', image='posts/no.gif'
+        )
+        for created in (len(POST_THUMBNAILS), 0):
+            out, err = StringIO(), StringIO()
+            call_command(
+                'warm_thumbnails', '--workers', '0', stdout=out, stderr=err
+            )
+            with self.subTest(created=created):
+                self.assertIn(
+                    f'создано миниатюр: {created}, ошибок: 1', out.getvalue()
+                )
+                self.assertIn('posts/no.gif', err.getvalue())
+        response = Client().get(self.url)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_upload_is_downscaled_and_reencoded(self):
+        """Тест уменьшения и перекодирования загруженной картинки"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Телефон'
+        buffer = BytesIO()
+        Image.new('RGB', (IMAGE_MAX_SIDE * 2, IMAGE_MAX_SIDE)).save(
+            buffer, 'JPEG', exif=exif
+        )
+        post = Post.objects.create(
+            author=self.user,
+            text='Большая картинка',
+            image=SimpleUploadedFile('photo.jpg', buffer.getvalue()),
+        )
+        self.assertTrue(post.image.name.endswith('.webp'))
+        self.assertEqual(
+            (post.image_width, post.image_height),
+            (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE // 2)
+        )
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'WEBP')
+            self.assertFalse(stored.getexif())
+
+    def test_oversized_upload_rejected(self):
+        """Тест отказа в загрузке слишком большого файла"""
+        with mock.patch('posts.forms.IMAGE_MAX_UPLOAD_SIZE', 10):
+            form = PostForm(
+                data={'text': 'Текст'},
+                files={'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                )},
+            )
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
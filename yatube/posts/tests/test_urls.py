@@ -42,6 +42,9 @@ class StaticUrlTest(TestCase):
         cls.POST_ADD_COMMENT_URL = reverse(
             'posts:add_comment', args=[cls.post.id]
         )
+        cls.POST_COMMENTS_URL = reverse(
+            'posts:post_comments', args=[cls.post.id]
+        )
         cls.ADD_COMMENT_TO_DETAIL = (
             f'{USER_LOGIN_URL}'
             f'?next={cls.POST_ADD_COMMENT_URL}')
@@ -60,6 +63,7 @@ class StaticUrlTest(TestCase):
             (GROUP_URL, self.guest, 200),
             (PROFILE_URL, self.guest, 200),
             (self.POST_DETAIL_URL, self.guest, 200),
+            (self.POST_COMMENTS_URL, self.guest, 200),
             (POST_CREATE_URL, self.author, 200),
             (POST_CREATE_URL, self.guest, 302),
             (self.POST_EDIT_URL, self.author, 200),
@@ -1,10 +1,27 @@
+import shutil
+import tempfile
+from unittest import mock
+
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 
-from posts.models import Follow, Post, Group, User
-from posts.settings import POSTS_ON_PAGE
+from posts.feeds import FOLLOW_FEED_ENGINES, backfill_timeline
+from posts.models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    User,
+    UserStats,
+)
+from posts.settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE
+from posts.stats import rebuild_user_stats
 
 SLUG = 'TestGroupSlug'
 SLUG_1 = 'TestGroupSlug1'
@@ -25,8 +42,14 @@ FOLLOW_INDEX_2ND_PAGE_URL = f'{FOLLOW_INDEX_URL}?page=2'
 FOLLOW_URL = reverse('posts:profile_follow', args=[NICK])
 ANOTHER_FOLLOW_URL = reverse('posts:profile_follow', args=[NOT_AUTHOR])
 UNFOLLOW_URL = reverse('posts:profile_unfollow', args=[NICK])
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_WORKERS=0,
+    PAGE_CACHE_ENABLED=False,
+)
 class ContextViewsTest(TestCase):
 
     @classmethod
@@ -73,6 +96,11 @@ class ContextViewsTest(TestCase):
             'posts:post_detail', args=[cls.ref_post.id]
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.guest = Client()
         self.author = Client()
@@ -102,6 +130,10 @@ class ContextViewsTest(TestCase):
                 group=self.group_1
             ) for post_num in range(POSTS_ON_PAGE)
         )
+        # bulk_create не вызывает сигналы: ленты подписок и счетчики
+        # пересобираются явно
+        backfill_timeline(self.another_user.id)
+        rebuild_user_stats()
         for url, posts_count in CASES:
             with self.subTest(url=url, posts_count=posts_count):
                 self.assertEqual(
@@ -109,6 +141,243 @@ class ContextViewsTest(TestCase):
                     posts_count
                 )
 
+    def test_cursor_paginator(self):
+        """Тест пагинации по курсору (?after=/?before=)."""
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                text=f'Текст. Автотест. Пост № {post_num}',
+                group=self.group_1
+            ) for post_num in range(POSTS_ON_PAGE)
+        )
+        # bulk_create не вызывает сигналы: ленты подписок и счетчики
+        # пересобираются явно
+        backfill_timeline(self.another_user.id)
+        rebuild_user_stats()
+        for url in [INDEX_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX_URL]:
+            with self.subTest(url=url):
+                first_page = self.another.get(url).context['page_obj']
+                self.assertEqual(len(first_page), POSTS_ON_PAGE)
+                self.assertFalse(first_page.has_previous())
+                self.assertTrue(first_page.has_next())
+                last_page = self.another.get(
+                    url, {'after': first_page.paginator.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(last_page), [self.ref_post])
+                self.assertTrue(last_page.has_previous())
+                self.assertFalse(last_page.has_next())
+                previous_page = self.another.get(
+                    url, {'before': last_page.paginator.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_timeline_bounded(self):
+        """Тест ограничения длины материализованной ленты подписок."""
+        with mock.patch('posts.feeds.TIMELINE_LENGTH', 2):
+            for post_num in range(3):
+                Post.objects.create(
+                    author=self.user,
+                    text=f'Текст. Автотест. Пост ленты № {post_num}',
+                )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.another_user).count(), 2
+        )
+        self.assertNotIn(
+            self.ref_post,
+            self.another.get(FOLLOW_INDEX_URL).context['page_obj']
+        )
+
+    def test_follow_feed_engines(self):
+        """Тест одинаковой ленты подписок для всех движков."""
+        for engine in FOLLOW_FEED_ENGINES:
+            with self.subTest(engine=engine), self.settings(
+                FOLLOW_FEED_ENGINE=engine
+            ):
+                cache.clear()
+                post = Post.objects.create(
+                    author=self.user,
+                    text=f'Текст. Автотест. Движок {engine}',
+                )
+                self.assertEqual(
+                    list(self.another.get(
+                        FOLLOW_INDEX_URL
+                    ).context['page_obj']),
+                    [post, self.ref_post]
+                )
+                self.assertEqual(
+                    len(self.author.get(FOLLOW_INDEX_URL).context['page_obj']),
+                    0
+                )
+                post.delete()
+
+    def test_feed_queries_budget(self):
+        """
+        Тест числа запросов к БД на страницах лент: не зависит от числа
+        постов на странице.
+        """
+        for post_num in range(POSTS_ON_PAGE):
+            author = User.objects.create_user(username=f'{NICK}{post_num}')
+            Follow.objects.create(user=self.another_user, author=author)
+            Post.objects.create(
+                author=author,
+                text=f'Текст. Автотест. Пост № {post_num}',
+                group=self.group_1
+            )
+        profile_url = reverse('posts:profile', args=[f'{NICK}0'])
+        CASES = [
+            (INDEX_URL, self.guest, 1),
+            (GROUP_URL, self.guest, 2),
+            (profile_url, self.guest, 2),
+            # Сессия и пользователь - еще два запроса
+            (INDEX_URL, self.another, 3),
+            (GROUP_URL, self.another, 4),
+            (profile_url, self.another, 5),
+            # Страница материализованной ленты и ее посты - два запроса
+            (FOLLOW_INDEX_URL, self.another, 4),
+        ]
+        for url, client, queries in CASES:
+            with self.subTest(url=url, queries=queries):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        return [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+
+    def test_paginator_count_cached(self):
+        """
+        Тест кэширования числа постов для постраничной навигации и его
+        обновления при записи.
+        """
+        CASES = [
+            (INDEX_2ND_PAGE_URL, self.guest),
+            (GROUP_2ND_PAGE_URL, self.guest),
+            (FOLLOW_INDEX_2ND_PAGE_URL, self.another),
+        ]
+        for url, client in CASES:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(len(self.count_queries(client, url)), 1)
+                self.assertEqual(self.count_queries(client, url), [])
+                Post.objects.create(
+                    author=self.user,
+                    text='Текст. Автотест. Пересчет числа постов',
+                    group=self.group_1
+                )
+                self.assertEqual(len(self.count_queries(client, url)), 1)
+        self.another.get(UNFOLLOW_URL)
+        self.assertEqual(
+            len(self.count_queries(self.another, FOLLOW_INDEX_2ND_PAGE_URL)), 1
+        )
+        self.assertEqual(
+            self.count_queries(self.guest, PROFILE_2ND_PAGE_URL), []
+        )
+
+    @override_settings(INDEX_COUNT_APPROXIMATE=True)
+    def test_paginator_count_approximate(self):
+        """Тест приближенного числа постов главной страницы"""
+        cache.clear()
+        self.assertEqual(
+            len(self.count_queries(self.guest, INDEX_2ND_PAGE_URL)), 1
+        )
+        Post.objects.create(
+            author=self.user,
+            text='Текст. Автотест. Приближенное число постов',
+        )
+        self.assertEqual(
+            self.count_queries(self.guest, INDEX_2ND_PAGE_URL), []
+        )
+
+    def test_follow_graph_cached(self):
+        """Тест кэширования подписок для кнопки подписки"""
+        cache.clear()
+        self.assertTrue(self.another.get(PROFILE_URL).context['following'])
+        with self.assertNumQueries(4):
+            self.another.get(PROFILE_URL)
+        self.another.get(UNFOLLOW_URL)
+        self.assertFalse(self.another.get(PROFILE_URL).context['following'])
+        self.another.get(FOLLOW_URL)
+        self.assertTrue(self.another.get(PROFILE_URL).context['following'])
+
+    def test_conditional_get(self):
+        """
+        Тест ответа 304 Not Modified на повторный запрос неизменившейся
+        страницы и 200 после записи.
+        """
+        CASES = [
+            (INDEX_URL, self.guest),
+            (GROUP_URL, self.guest),
+            (PROFILE_URL, self.another),
+            (self.POST_DETAIL_URL, self.guest),
+            (FOLLOW_INDEX_URL, self.another),
+        ]
+        for url, client in CASES:
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                Comment.objects.create(
+                    author=self.user, post=self.ref_post, text='Комментарий'
+                )
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        etag = self.guest.get(self.POST_DETAIL_URL)['ETag']
+        Comment.objects.all().delete()
+        self.assertEqual(
+            self.guest.get(
+                self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200
+        )
+        etag = self.another.get(PROFILE_URL)['ETag']
+        self.another.get(UNFOLLOW_URL)
+        self.assertEqual(
+            self.another.get(
+                PROFILE_URL, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200
+        )
+        etag = self.guest.get(INDEX_URL)['ETag']
+        with self.assertNumQueries(0):
+            self.guest.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_conditional_get_after_login(self):
+        """
+        Тест новой страницы с формами после повторного входа: токен CSRF
+        сменился, и прежний ETag не подходит. Вошедшим пользователям
+        Last-Modified не отдается.
+        """
+        response = self.another.get(PROFILE_URL)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('Last-Modified', self.guest.get(PROFILE_URL))
+        self.assertEqual(
+            self.another.get(
+                PROFILE_URL, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            304
+        )
+        self.assertEqual(
+            self.another.get(
+                PROFILE_URL, HTTP_IF_MODIFIED_SINCE=http_date(2 ** 32)
+            ).status_code,
+            200
+        )
+        self.another.logout()
+        self.another.force_login(self.another_user)
+        self.assertEqual(
+            self.another.get(
+                PROFILE_URL, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200
+        )
+
     def test_post_in_correct_feeds_and_details(self):
         """
         Тест наличия эталонного поста на страницах, содержащих ленты постов
@@ -137,6 +406,80 @@ class ContextViewsTest(TestCase):
                 self.assertEqual(post.text, self.ref_post.text)
                 self.assertEqual(post.image, self.ref_post.image)
 
+    def test_feeds_render_excerpt(self):
+        """
+        Тест карточек лент: выводится сохраненное начало текста, полный
+        текст поста не загружается.
+        """
+        post = Post.objects.create(
+            author=self.user,
+            text='Начало длинного поста. ' + 'Продолжение. ' * 50,
+            group=self.group_1
+        )
+        CASES = [
+            (INDEX_URL, self.guest),
+            (GROUP_URL, self.guest),
+            (PROFILE_URL, self.guest),
+            (FOLLOW_INDEX_URL, self.another),
+        ]
+        for url, client in CASES:
+            with self.subTest(url=url):
+                response = client.get(url)
+                feed_post = response.context['page_obj'][0]
+                self.assertEqual(feed_post.pk, post.pk)
+                self.assertIn('text', feed_post.get_deferred_fields())
+                self.assertContains(response, post.excerpt)
+                self.assertContains(response, 'читать продолжение')
+                self.assertNotContains(response, post.text)
+
+    def test_post_detail_comments(self):
+        """
+        Тест комментариев на странице поста: выводятся порциями по курсору,
+        число запросов не зависит от числа комментариев, следующая порция
+        отдается фрагментом HTML.
+        """
+        for comment_num in range(COMMENTS_ON_PAGE + 5):
+            author = User.objects.create_user(
+                username=f'{NICK}{comment_num}'
+            )
+            Comment.objects.create(
+                author=author,
+                post=self.ref_post,
+                text=f'Комментарий № {comment_num}'
+            )
+        with self.assertNumQueries(2):
+            response = self.guest.get(self.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(
+            comments[0].text, f'Комментарий № {COMMENTS_ON_PAGE + 4}'
+        )
+        self.assertTrue(comments.has_next())
+        comments_url = reverse(
+            'posts:post_comments', args=[self.ref_post.id]
+        )
+        next_url = (
+            f'{comments_url}?after={comments.paginator.next_cursor}'
+        )
+        self.assertContains(response, next_url)
+        with self.assertNumQueries(2):
+            response = self.guest.get(next_url)
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий № {num}' for num in range(4, -1, -1)]
+        )
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, 'data-comments-url')
+        self.assertEqual(
+            self.guest.get(
+                reverse('posts:post_comments', args=[0])
+            ).status_code,
+            404
+        )
+
     def test_post_not_in_wrong_pages(self):
         """
         Тест отсутствия эталонного поста на страницах,на которых он
@@ -182,6 +525,18 @@ class ContextViewsTest(TestCase):
             self.user
         )
 
+    def test_pages_without_user_stats(self):
+        """Тест страниц автора, у которого нет строки счетчиков."""
+        UserStats.objects.filter(user=self.user).delete()
+        CASES = [
+            (PROFILE_URL, 'Всего постов: 0'),
+            (self.POST_DETAIL_URL, 'Всего постов автора: <span>0</span>'),
+        ]
+        for url, text in CASES:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertContains(self.guest.get(url), text)
+
     def test_context_correct_group(self):
         """Тест корректной группы в контексте страницы."""
         group = self.guest.get(GROUP_URL).context['group']
@@ -192,14 +547,64 @@ class ContextViewsTest(TestCase):
 
     def test_index_page_cached(self):
         """Тест кэширования главной страницы"""
+        text = 'Текст. Автотест. Кэширование главной страницы'
         before = self.guest.get(INDEX_URL).content
-        Post.objects.create(
-            author=self.user,
-            text='Текст. Автотест. Кэширование главной страницы',
-            group=self.group_1
+        # update() не меняет версию ленты, поэтому кэш не сбрасывается;
+        # в ленте выводится начало текста поста
+        Post.objects.filter(pk=self.ref_post.pk).update(
+            text=text, excerpt=text
         )
         after = self.guest.get(INDEX_URL).content
         self.assertEqual(before, after)
+        self.assertNotIn(text.encode(), after)
+        cache.clear()
+        self.assertIn(text.encode(), self.guest.get(INDEX_URL).content)
+
+    def test_feed_cache_invalidated_on_write(self):
+        """Тест сброса кэша лент при создании поста и комментария"""
+        for url in [INDEX_URL, GROUP_URL, PROFILE_URL]:
+            with self.subTest(url=url):
+                self.guest.get(url)
+                post = Post.objects.create(
+                    author=self.user,
+                    text=f'Текст. Автотест. Сброс кэша ленты {url}',
+                    group=self.group_1
+                )
+                self.assertIn(post.text.encode(), self.guest.get(url).content)
+                Comment.objects.create(
+                    author=self.user, post=post, text='Комментарий'
+                )
+                edited_post = Post.objects.get(pk=self.ref_post.pk)
+                edited_post.text = f'Текст. Автотест. Правка {url}'
+                edited_post.save()
+                self.assertIn(
+                    edited_post.text.encode(), self.guest.get(url).content
+                )
+
+    def test_feed_cache_page_aware(self):
+        """Тест раздельного кэша для разных страниц ленты"""
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                text=f'Текст. Автотест. Пост № {post_num}',
+                group=self.group_1
+            ) for post_num in range(POSTS_ON_PAGE)
+        )
+        rebuild_user_stats()
+        for url, page_2_url in [
+            (INDEX_URL, INDEX_2ND_PAGE_URL),
+            (GROUP_URL, GROUP_2ND_PAGE_URL),
+            (PROFILE_URL, PROFILE_2ND_PAGE_URL),
+        ]:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertNotIn(
+                    self.ref_post.text.encode(), self.guest.get(url).content
+                )
+                self.assertIn(
+                    self.ref_post.text.encode(),
+                    self.guest.get(page_2_url).content
+                )
 
     def test_index_page_flushed_cache(self):
         """Тест проверки очистки кэша"""
@@ -242,6 +647,50 @@ class ContextViewsTest(TestCase):
         self.assertEqual(follow.user, self.user)
         self.assertEqual(follow.author, self.another_user)
 
+    def test_subscription_json(self):
+        """
+        Тест подписки и отписки через POST без рендеринга ленты подписок:
+        ответ JSON с состоянием и счетчиком, повтор ничего не меняет.
+        """
+        follow_url = reverse(
+            'posts:subscription_follow', args=[NOT_AUTHOR]
+        )
+        unfollow_url = reverse(
+            'posts:subscription_unfollow', args=[NOT_AUTHOR]
+        )
+        CASES = [
+            (follow_url, True, 1),
+            (follow_url, True, 1),
+            (unfollow_url, False, 0),
+            (unfollow_url, False, 0),
+        ]
+        for url, following, followers_count in CASES:
+            with self.subTest(url=url, following=following):
+                response = self.author.post(
+                    url, HTTP_ACCEPT='application/json'
+                )
+                self.assertTemplateNotUsed(response, 'posts/follow.html')
+                self.assertEqual(response.json(), {
+                    'following': following,
+                    'followers_count': followers_count,
+                })
+                self.assertEqual(
+                    Follow.objects.filter(
+                        user=self.user, author=self.another_user
+                    ).exists(),
+                    following
+                )
+        self.assertRedirects(
+            self.author.post(follow_url), PROFILE_NOT_AUTHOR_URL
+        )
+        self.assertEqual(self.author.get(follow_url).status_code, 405)
+        self.assertEqual(
+            self.author.post(
+                reverse('posts:subscription_follow', args=[NICK])
+            ).status_code,
+            400
+        )
+
     def test_favorites_feed_unfollow(self):
         """"Тест исчезновения эталонного поста с ленты избранных при отписке"""
         self.assertEqual(
@@ -0,0 +1,189 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from .feeds import bump_feed_versions
+from .models import Post
+from .settings import POST_THUMBNAIL_SRCSET, POST_THUMBNAILS
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра для шаблона; у заглушки еще не созданной миниатюры url пуст,
+# srcset - готовые варианты WebP из POST_THUMBNAIL_SRCSET
+Thumbnail = namedtuple('Thumbnail', 'url width height srcset')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def find_thumbnail(image, geometry, options):
+    """
+    Возвращает миниатюру из хранилища ключей sorl-thumbnail, не создавая
+    ее. Параметры дополняются так же, как в ThumbnailBackend.get_thumbnail,
+    поэтому имя миниатюры совпадает с созданной им.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def source_image(name):
+    """
+    Картинка поста по имени файла. Ключи миниатюр sorl-thumbnail зависят
+    от хранилища исходного файла, поэтому оно берется из поля Post.image.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate_thumbnails(name):
+    """Создает все миниатюры картинки поста из POST_THUMBNAILS."""
+    image = source_image(name)
+    for geometry, options in POST_THUMBNAILS.values():
+        get_thumbnail(image, geometry, **options)
+
+
+def warm_thumbnails(name):
+    """
+    Создает недостающие миниатюры картинки из POST_THUMBNAILS и
+    возвращает их число. Уже созданные миниатюры пропускаются.
+    """
+    image = source_image(name)
+    if not image.exists():
+        raise FileNotFoundError(f'Нет файла картинки: {name}')
+    created = 0
+    for geometry, options in POST_THUMBNAILS.values():
+        if find_thumbnail(image, geometry, options) is None:
+            get_thumbnail(image, geometry, **options)
+            created += 1
+    return created
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _generate_safely(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return False
+    return True
+
+
+def _generate_in_background(post, name):
+    close_old_connections()
+    try:
+        if _generate_safely(name):
+            # Страницы с заглушкой могли попасть в кэш фрагментов
+            bump_feed_versions(post)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        close_old_connections()
+
+
+def schedule_thumbnails(post):
+    """
+    Ставит создание миниатюр картинки поста в очередь фонового пула
+    потоков. Картинка, миниатюры которой уже создаются, повторно не
+    ставится. При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу.
+    """
+    name = post.image.name
+    if not name:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        _generate_safely(name)
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    get_executor().submit(_generate_in_background, post, name)
+
+
+def thumbnail_size(geometry, options, width=None, height=None):
+    """
+    Размер миниатюры по геометрии и сохраненным размерам картинки, без
+    чтения файла. Обрезанная миниатюра совпадает с геометрией.
+    """
+    size = parse_geometry(geometry)
+    if options.get('crop') or not (width and height):
+        return size
+    ratio = min(size[0] / width, size[1] / height)
+    if not options.get('upscale', sorl_settings.THUMBNAIL_UPSCALE):
+        ratio = min(ratio, 1)
+    return round(width * ratio), round(height * ratio)
+
+
+def ready_thumbnail(image, geometry, options):
+    """
+    Готовая миниатюра либо None. При THUMBNAIL_WORKERS = 0 недостающая
+    миниатюра создается сразу, иначе картинка ставится в очередь фонового
+    создания: задача могла пропасть при перезапуске процесса или ошибке.
+    """
+    thumbnail = find_thumbnail(image, geometry, options)
+    if thumbnail:
+        return thumbnail
+    if not settings.THUMBNAIL_WORKERS:
+        return get_thumbnail(image, geometry, **options)
+    schedule_thumbnails(image.instance)
+    return None
+
+
+def post_thumbnail(image, name='card'):
+    """
+    Готовая миниатюра картинки поста либо заглушка без url, пока
+    миниатюра создается в фоне. Страница сама миниатюры не создает, а
+    только ставит их в очередь, размеры берутся из полей поста. В srcset
+    попадают только уже созданные варианты WebP.
+    """
+    if not image:
+        return None
+    geometry, options = POST_THUMBNAILS[name]
+    post = image.instance
+    size = thumbnail_size(
+        geometry, options, post.image_width, post.image_height
+    )
+    thumbnail = ready_thumbnail(image, geometry, options)
+    if not thumbnail:
+        return Thumbnail('', *size, '')
+    srcset = []
+    for variant in POST_THUMBNAIL_SRCSET.get(name, ()):
+        variant_geometry, variant_options = POST_THUMBNAILS[variant]
+        found = ready_thumbnail(image, variant_geometry, variant_options)
+        if found:
+            width, _ = thumbnail_size(
+                variant_geometry,
+                variant_options,
+                post.image_width,
+                post.image_height
+            )
+            srcset.append(f'{found.url} {width}w')
+    return Thumbnail(thumbnail.url, *size, ', '.join(srcset))
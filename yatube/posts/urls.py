@@ -12,6 +12,11 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -23,5 +28,19 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/subscription/follow/',
+        views.profile_subscription,
+        {'follow': True},
+        name='subscription_follow'
+    ),
+    path(
+        'profile/<str:username>/subscription/unfollow/',
+        views.profile_subscription,
+        {'follow': False},
+        name='subscription_unfollow'
+    ),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_posts, name='export_posts'),
     path('', views.index, name='index'),
 ]
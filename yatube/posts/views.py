@@ -1,62 +1,191 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_POST
 
+from .feeds import (
+    feed_count_options,
+    feed_posts,
+    follow_author,
+    follow_feed,
+    follow_feed_keys,
+    get_feed_version,
+    get_followed_author_ids,
+    unfollow_author,
+)
+from .export import export_lines
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .settings import POSTS_ON_PAGE
+from .models import Group, Post, User, UserStats
+from .paginators import CountingPaginator, CursorPaginator
+from .search import search_page
+from .stats import get_user_stats
+from .settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE
 
 
-def paginate(request, posts, posts_per_page=POSTS_ON_PAGE):
-    """Функция пагинации"""
-    return Paginator(posts, posts_per_page).get_page(request.GET.get('page'))
+def paginate(request, posts, posts_per_page=POSTS_ON_PAGE, keys=None,
+             **count_options):
+    """
+    Функция пагинации. По умолчанию постраничная навигация идет по курсору
+    (?after=/?before=), номер страницы (?page=) поддерживается как запасной
+    вариант. keys передаются в CursorPaginator, count_options - в
+    CountingPaginator, в page_window страницы кладутся номера для окна
+    навигации.
+    """
+    if 'page' in request.GET:
+        page = CountingPaginator(
+            posts, posts_per_page, **count_options
+        ).get_page(request.GET.get('page'))
+        page.page_window = list(
+            page.paginator.get_elided_page_range(page.number)
+        )
+        return page
+    return CursorPaginator(posts, posts_per_page, keys=keys).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def conditional_render(request, template, get_context, *scopes):
+    """
+    Отвечает 304 Not Modified без рендеринга, если у клиента уже есть
+    страница для текущих версий лент scopes. Иначе рендерит шаблон с
+    контекстом get_context() и проставляет ETag, а анонимным читателям и
+    Last-Modified. Версии лент запоминаются в request.feed_versions для
+    кэша страниц.
+
+    Страницы вошедших пользователей содержат формы с токеном CSRF: ETag
+    учитывает cookie CSRF, которая меняется при входе, а Last-Modified не
+    отдается, чтобы по одной дате не получить страницу другого сеанса.
+    """
+    request.feed_versions = {
+        scope: get_feed_version(scope) for scope in scopes
+    }
+    versions = request.feed_versions.values()
+    parts = [*versions, request.user.pk]
+    last_modified = max(versions) // 10 ** 9
+    if request.user.is_authenticated:
+        # Заводит cookie CSRF до рендеринга, если ее еще нет
+        get_token(request)
+        parts.append(request.META['CSRF_COOKIE'])
+        last_modified = None
+    etag = quote_etag('-'.join(str(part) for part in parts))
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = render(request, template, get_context())
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
 
 
 def index(request):
     """View-функция для главной страницы"""
-    return render(request, 'posts/index.html', {
-        'page_obj': paginate(request, Post.objects.all())
-    })
+    version = get_feed_version('index')
+    return conditional_render(request, 'posts/index.html', lambda: {
+        'page_obj': paginate(
+            request,
+            feed_posts(Post.objects.all()),
+            **feed_count_options('index', version)
+        ),
+        'feed_version': version,
+    }, 'index')
 
 
 def group_posts(request, slug):
     """View-функция для страницы с лентой группы"""
     group = get_object_or_404(Group, slug=slug)
-    return render(request, 'posts/group_list.html', {
+    scope = f'group:{group.id}'
+    version = get_feed_version(scope)
+    return conditional_render(request, 'posts/group_list.html', lambda: {
         'group': group,
-        'page_obj': paginate(request, group.posts.all())
-    })
+        'page_obj': paginate(
+            request,
+            feed_posts(group.posts.all()),
+            **feed_count_options(scope, version)
+        ),
+        'feed_version': version,
+    }, scope)
 
 
 def profile(request, username):
     """View-функция для страницы с лентой профиля"""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     following = request.user.is_authenticated and (
-        Follow.objects.filter(
-            user=request.user,
-            author=author,
-        ).exists()
+        author.id in get_followed_author_ids(request.user.id)
     )
-    return render(request, 'posts/profile.html', {
+    scope = f'author:{author.id}'
+    version = get_feed_version(scope)
+    return conditional_render(request, 'posts/profile.html', lambda: {
         'author': author,
-        'page_obj': paginate(request, author.posts.all()),
+        'page_obj': paginate(
+            request,
+            feed_posts(author.posts.all()),
+            count=get_user_stats(author).posts_count
+        ),
         'following': following,
-    })
+        'feed_version': version,
+    }, scope, f'follows:{request.user.pk}')
+
+
+def comment_page(request, post):
+    """
+    Страница комментариев поста по курсору (?after=) вместе с авторами,
+    загруженными тем же запросом.
+    """
+    return CursorPaginator(
+        post.comments.select_related('author').only(
+            'text',
+            'created',
+            'post_id',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+        ),
+        COMMENTS_ON_PAGE
+    ).get_page(after=request.GET.get('after'))
 
 
 def post_detail(request, post_id):
     """View-функция для страницы подробной информации о посте"""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
-    return render(request, 'posts/post_detail.html', {
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    # Автору без строки счетчиков шаблон покажет нулевые
+    get_user_stats(post.author)
+    return conditional_render(request, 'posts/post_detail.html', lambda: {
         'post': post,
-        'form': form,
-        'comments': comments,
-    })
+        'form': CommentForm(),
+        'comments': comment_page(request, post),
+    }, f'author:{post.author_id}')
+
+
+def post_comments(request, post_id):
+    """
+    View-функция для подгрузки следующей страницы комментариев поста
+    фрагментом HTML
+    """
+    post = get_object_or_404(Post.objects.only('id', 'author_id'), id=post_id)
+    return conditional_render(request, 'includes/comment_list.html', lambda: {
+        'post': post,
+        'comments': comment_page(request, post),
+    }, f'author:{post.author_id}')
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     """View-функция для создания поста"""
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -88,6 +217,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     """View-функция для создания комментария"""
     post = get_object_or_404(Post, id=post_id)
@@ -104,30 +234,94 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """View-функция для страницы с лентой постов избранных авторов"""
-    context = {
+    scope = f'follows:{request.user.id}'
+    # Лента подписок меняется с новыми постами и со сменой подписок
+    version = f"{get_feed_version('index')}-{get_feed_version(scope)}"
+    return conditional_render(request, 'posts/follow.html', lambda: {
         'page_obj': paginate(
             request,
-            Post.objects.filter(author__following__user=request.user)
+            feed_posts(follow_feed(request.user)),
+            keys=follow_feed_keys(request.user),
+            **feed_count_options(scope, version)
         )
-    }
-    return render(request, 'posts/follow.html', context)
+    }, 'index', scope)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """View-функция для подписки на автора"""
     author = get_object_or_404(User, username=username)
-    if author == request.user:
-        return redirect('posts:follow_index')
-    Follow.objects.get_or_create(user=request.user, author=author)
+    if author != request.user:
+        follow_author(request.user.id, author.id)
     return redirect('posts:follow_index')
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """View-функция для отписки от автора"""
-    Follow.objects.filter(
-        author=get_object_or_404(User, username=username),
-        user=request.user
-    ).delete()
+    author = get_object_or_404(User, username=username)
+    unfollow_author(request.user.id, author.id)
     return redirect('posts:follow_index')
+
+
+@require_POST
+@login_required
+@transaction.atomic
+def profile_subscription(request, username, follow):
+    """
+    View-функция для подписки на автора (follow=True) и отписки от него
+    без перехода на ленту подписок. Отвечает JSON с новым состоянием и
+    счетчиками, а запросу без Accept: application/json - редиректом на
+    профиль автора.
+    """
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    if author.id == request.user.id:
+        return HttpResponseBadRequest('Нельзя подписаться на самого себя')
+    if follow:
+        follow_author(request.user.id, author.id)
+    else:
+        unfollow_author(request.user.id, author.id)
+    if 'application/json' not in request.headers.get('Accept', ''):
+        return redirect('posts:profile', username)
+    followers_count = UserStats.objects.filter(
+        user_id=author.id
+    ).values_list('followers_count', flat=True).first()
+    return JsonResponse({
+        'following': follow,
+        'followers_count': followers_count or 0,
+    })
+
+
+def search(request):
+    """View-функция для поиска по текстам постов"""
+    query = request.GET.get('q', '').strip()
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': search_page(
+            query,
+            POSTS_ON_PAGE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        ) if query else None,
+    })
+
+
+@staff_member_required
+def export_posts(request):
+    """View-функция для потоковой выгрузки постов в формате JSON Lines"""
+    try:
+        lines = export_lines(
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        lines, content_type='application/x-ndjson; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'attachment; filename="posts.jsonl"'
+    return response
@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -129,8 +130,41 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Двухуровневый кэш: LRU в памяти процесса поверх общего для всех
+# процессов файлового кэша. Журнал инвалидаций хранится отдельно от
+# значений, в подкаталоге journal.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'L2': {
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            },
+            'L1_MAX_ENTRIES': 500,
+            'L1_TIMEOUT': 60,
+            'SYNC_INTERVAL': 1,
+        },
     }
 }
+# Тесты manage.py test работают с кэшем в памяти (pytest - см.
+# tests/conftest.py)
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Движок ленты подписок: 'timeline' - материализованная лента (fan-out
+# on write), 'merge' - слияние кэшированных лент авторов (fan-out on read),
+# 'join' - запрос через таблицу подписок
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Приближенное число постов главной страницы для постраничной навигации:
+# не пересчитывается при каждой записи, а кэшируется на несколько минут
+INDEX_COUNT_APPROXIMATE = False
+
+# Число потоков фоновой генерации миниатюр картинок постов; 0 - миниатюры
+# создаются синхронно при сохранении поста и отрисовке страницы
+THUMBNAIL_WORKERS = 2
+
+# Кэш целых страниц для анонимных читателей (см. PAGE_CACHE_VIEWS).
+# Страница из кэша отдается без контекста шаблона, поэтому тесты
+# контекста его выключают.
+PAGE_CACHE_ENABLED = True